@@ -2,7 +2,10 @@ import unicodedata
 import base64
 import pandas as pd
 import streamlit as st
-from database import Database
+from cliente import ClienteConsultas, ErroServico
+from resultados import montar_dataframe
+from consultas import (SUGGEST_LIMIT, FILIAIS_PAGINA, _MAPEAMENTO_PORTE_FWD, SITUACAO_MAP_INV,
+                       AMOSTRA_PERCENTUAL)
 
 st.set_page_config(
     page_title="Sistema de Consulta de Empresas",
@@ -56,161 +59,68 @@ def formatar_moeda(valor):
     except Exception:
         return f"R$ {valor}"
 
-_MAPEAMENTO_PORTE_FWD = {"01": "Microempresa", "03": "Empresa de Pequeno Porte", "05": "Demais"}
-_MAPEAMENTO_PORTE_REV = {"Microempresa": "01", "Empresa de Pequeno Porte": "03", "Demais": "05"}
-
 def traduzir_porte(porte):
     if pd.isna(porte):
         return "N/A"
     p = str(porte).zfill(2)
     return _MAPEAMENTO_PORTE_FWD.get(p, p)
 
-db = Database()
+# Todas as consultas passam pelo serviço (servico.py): pool de conexões e cache
+# compartilhados entre todas as sessões da app e os demais clientes.
+api = ClienteConsultas()
+try:
+    api.saude()
+except ErroServico as e:
+    st.error(f"Serviço de consultas indisponível ({e}). Inicie-o com `python servico.py` e recarregue a página.")
+    st.stop()
 
 @st.cache_data(show_spinner=False)
 def get_ufs():
-    try:
-        result, _ = db.execute_query("SELECT DISTINCT uf FROM estabelecimento WHERE uf IS NOT NULL ORDER BY uf")
-        return [r[0] for r in result] if result else []
-    except Exception:
-        return []
+    return api.get_ufs()
 
 # NOVA FUNÇÃO: Buscar cidades por UF
 @st.cache_data(show_spinner=False)
 def get_cidades(uf=None):
-    try:
-        if uf and uf != "Todos":
-            sql = "SELECT DISTINCT municipio FROM estabelecimento WHERE uf = %s AND municipio IS NOT NULL ORDER BY municipio"
-            result, _ = db.execute_query(sql, (uf,))
-        else:
-            sql = "SELECT DISTINCT municipio FROM estabelecimento WHERE municipio IS NOT NULL ORDER BY municipio"
-            result, _ = db.execute_query(sql)
-        return [r[0] for r in result] if result else []
-    except Exception:
-        return []
+    return api.get_cidades(uf)
 
 @st.cache_data(show_spinner=False)
 def get_portes():
-    try:
-        result, _ = db.execute_query("SELECT DISTINCT porte_empresa FROM empresa WHERE porte_empresa IS NOT NULL ORDER BY porte_empresa")
-        vistos = []
-        for (cod,) in result or []:
-            lbl = traduzir_porte(cod)
-            if lbl not in vistos:
-                vistos.append(lbl)
-        return vistos
-    except Exception:
-        return []
+    vistos = []
+    for cod in api.get_portes():
+        lbl = traduzir_porte(cod)
+        if lbl not in vistos:
+            vistos.append(lbl)
+    return vistos
 
 @st.cache_data(show_spinner=False)
 def get_capital_range():
-    try:
-        result, _ = db.execute_query("""
-            SELECT PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY capital_social) AS p95
-            FROM empresa
-            WHERE capital_social IS NOT NULL AND capital_social > 0
-        """)
-        if result and result[0] and result[0][0] and result[0][0] > 0:
-            return 0, float(result[0][0])
-        return 0, 500000
-    except Exception:
-        return 0, 250000
+    return api.get_capital_range()
 
 @st.cache_data(ttl=600, show_spinner=False)
 def get_cnae_infos(codigos):
     """Mapa codigo_limpo -> descrição (para chips bonitos)."""
-    if not codigos:
-        return {}
-    placeholders = ", ".join(["%s"] * len(codigos))
-    sql = f"""
-        SELECT regexp_replace(c.codigo::text, '\\D', '', 'g') AS codigo_limpo, c.descricao
-        FROM cnae c
-        WHERE regexp_replace(c.codigo::text, '\\D', '', 'g') IN ({placeholders})
-    """
-    res, _ = db.execute_query(sql, codigos)
-    return {row[0]: row[1] for row in (res or [])}
-
-SUGGEST_LIMIT = 20
-
-def _sql_sugerir_cnae_unaccent():
-    return """
-        SELECT
-            regexp_replace(c.codigo::text, '\\D', '', 'g') AS codigo_limpo,
-            c.descricao,
-            COUNT(est.cnpj) AS empresas
-        FROM cnae c
-        LEFT JOIN estabelecimento est
-          ON est.cnae_fiscal_principal::text = regexp_replace(c.codigo::text, '\\D', '', 'g')
-        WHERE unaccent(lower(c.descricao)) LIKE unaccent(lower(%s))
-        GROUP BY 1,2
-        ORDER BY empresas DESC, codigo_limpo
-        LIMIT %s
-    """
-
-def _sql_sugerir_cnae_fallback():
-    return """
-        SELECT
-            regexp_replace(c.codigo::text, '\\D', '', 'g') AS codigo_limpo,
-            c.descricao,
-            COUNT(est.cnpj) AS empresas
-        FROM cnae c
-        LEFT JOIN estabelecimento est
-          ON est.cnae_fiscal_principal::text = regexp_replace(c.codigo::text, '\\D', '', 'g')
-        WHERE lower(c.descricao) ILIKE lower(%s)
-        GROUP BY 1,2
-        ORDER BY empresas DESC, codigo_limpo
-        LIMIT %s
-    """
-
-@st.cache_data(show_spinner=False)
-def has_unaccent() -> bool:
-    try:
-        res, _ = db.execute_query("SELECT 1 FROM pg_extension WHERE extname = 'unaccent' LIMIT 1")
-        return bool(res)
-    except Exception:
-        return False
+    return api.get_cnae_infos(codigos)
 
 @st.cache_data(ttl=600, show_spinner=False)
 def sugerir_cnae_cache(termo: str, limit: int = SUGGEST_LIMIT):
     if not termo or len(termo.strip()) < 2:
         return []
-    termo = termo.strip()
-    try:
-        if has_unaccent():
-            res, _ = db.execute_query(_sql_sugerir_cnae_unaccent(), (f"%{termo}%", limit))
-            return res or []
-    except Exception:
-        pass
- 
-    res2, _ = db.execute_query(_sql_sugerir_cnae_fallback(), (f"%{termo}%", limit))
-    return res2 or []
+    return api.sugerir_cnae(termo.strip(), limit)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def get_detalhes(cnpj: str):
+    return api.detalhes([cnpj])
+
+@st.cache_data(ttl=600, show_spinner=False)
+def get_filiais(cnpj_basico: str, cursor=None):
+    return api.filiais(cnpj_basico, cursor=cursor, limit=FILIAIS_PAGINA)
 
 # NOVA FUNÇÃO: Buscar sugestões unificadas para Razão Social e Nome Fantasia
 @st.cache_data(ttl=600, show_spinner=False)
 def sugerir_nome_empresa(termo: str, limit: int = 12):
     if not termo or len(termo.strip()) < 2:
         return []
-    
-    sql = """
-        (
-            SELECT emp.razao_social AS nome, 'Razão Social' AS tipo, COUNT(*) AS qtd
-            FROM empresa emp
-            JOIN estabelecimento est USING (cnpj_basico)
-            WHERE emp.razao_social ILIKE %s
-            GROUP BY emp.razao_social
-        )
-        UNION ALL
-        (
-            SELECT est.nome_fantasia AS nome, 'Nome Fantasia' AS tipo, COUNT(*) AS qtd
-            FROM estabelecimento est
-            WHERE est.nome_fantasia ILIKE %s
-            GROUP BY est.nome_fantasia
-        )
-        ORDER BY qtd DESC, nome
-        LIMIT %s
-    """
-    res, _ = db.execute_query(sql, (f"%{termo.strip()}%", f"%{termo.strip()}%", limit))
-    return res or []
+    return api.sugerir_nome_empresa(termo.strip(), limit)
 
 if "filtros" not in st.session_state:
     st.session_state.filtros = {
@@ -230,8 +140,12 @@ if "cnaes_selecionados" not in st.session_state:
     st.session_state.cnaes_selecionados = list(st.session_state.filtros["cnae"]) 
 if "page" not in st.session_state:
     st.session_state.page = 1
+if "cursores" not in st.session_state:
+    st.session_state.cursores = [None]  # cursores[p - 1] = cursor keyset da página p
 if "consulta_pronta" not in st.session_state:
     st.session_state.consulta_pronta = False
+if "exploracao" not in st.session_state:
+    st.session_state.exploracao = None
 
 if "cnae_resultados" not in st.session_state:
     st.session_state.cnae_resultados = []   
@@ -239,79 +153,6 @@ if "cnae_resultados" not in st.session_state:
 if "cnae_multisel_version" not in st.session_state:
     st.session_state.cnae_multisel_version = 0
 
-def build_queries(filtros: dict, limit: int = None, offset: int = None):
-    base_where = "WHERE 1=1"
-    params = []
-
-    if filtros["cnpj"]:
-        base_where += " AND est.cnpj ILIKE %s"
-        params.append(f"%{filtros['cnpj']}%")
-    
-    # MODIFICAÇÃO: Campo unificado para Razão Social e Nome Fantasia
-    if filtros["nome_empresa"]:
-        base_where += " AND (emp.razao_social ILIKE %s OR est.nome_fantasia ILIKE %s)"
-        params.append(f"%{filtros['nome_empresa']}%")
-        params.append(f"%{filtros['nome_empresa']}%")
-    
-    # NOVO FILTRO: Cidade
-    if filtros["cidade"] != "Todos":
-        base_where += " AND est.municipio = %s"
-        params.append(filtros["cidade"])
-    
-    if filtros["cnae"] and "Todos" not in filtros["cnae"]:
-        placeholders = ", ".join(["%s"] * len(filtros["cnae"]))
-        base_where += f" AND est.cnae_fiscal_principal::text IN ({placeholders})"
-        params.extend(filtros["cnae"])
-    if filtros["uf"] != "Todos":
-        base_where += " AND est.uf = %s"
-        params.append(filtros["uf"])
-    if filtros["porte"] != "Todos":
-        porte_codigo = _MAPEAMENTO_PORTE_REV.get(filtros["porte"], filtros["porte"])
-        base_where += " AND COALESCE(LPAD(emp.porte_empresa::text, 2, '0'), '') = %s"
-        params.append(str(porte_codigo).zfill(2))
-    if filtros["situacao"] != "Todos":
-        situacao_map = {"Ativa": 2, "Baixada": 3, "Suspensa": 4, "Inapta": 8, "Nula": 5}
-        base_where += " AND est.situacao_cadastral = %s"
-        params.append(situacao_map[filtros["situacao"]])
-    if not filtros.get("sem_limite_capital", False):
-        base_where += " AND emp.capital_social BETWEEN %s AND %s"
-        params.append(filtros["capital_min"])
-        params.append(filtros["capital_max"])
-    else:
-        base_where += " AND emp.capital_social > 0"
-
-    sql_count = f"""
-        SELECT COUNT(*)
-        FROM estabelecimento est
-        LEFT JOIN empresa emp ON est.cnpj_basico = emp.cnpj_basico
-        {base_where}
-    """
-    params_count = list(params)
-
-    sql_select = f"""
-        SELECT
-            emp.razao_social,
-            est.nome_fantasia,
-            est.cnpj,
-            est.uf,
-            est.data_inicio_atividade,
-            est.situacao_cadastral,
-            emp.porte_empresa,
-            emp.capital_social,
-            est.municipio,
-            est.cnae_fiscal_principal,
-            cna.descricao AS cnae_descricao
-        FROM estabelecimento est
-        LEFT JOIN empresa emp ON est.cnpj_basico = emp.cnpj_basico
-        LEFT JOIN cnae cna
-          ON regexp_replace(cna.codigo::text, '\\D', '', 'g') = est.cnae_fiscal_principal::text
-        {base_where}
-        ORDER BY emp.razao_social NULLS LAST
-        LIMIT %s OFFSET %s
-    """
-    params_select = list(params) + [limit if limit is not None else 100, offset if offset is not None else 0]
-    return (sql_count, params_count), (sql_select, params_select)
-
 st.title("Sistema de Consulta de Empresas")
 st.markdown("---")
 
@@ -393,6 +234,8 @@ with st.sidebar.form("filtros_form", clear_on_submit=False):
     limit_slider = st.slider("Resultados por página", 10, 500, st.session_state.filtros.get("limit", 100))
 
     atualizar_contagem = st.form_submit_button("📊 Atualizar contagem", use_container_width=True)
+    explorar = st.form_submit_button("⚡ Exploração rápida (amostra)", use_container_width=True,
+                                     help=f"Contagem aproximada sobre {AMOSTRA_PERCENTUAL}% de estabelecimento")
     executar_consulta = st.form_submit_button("🔍 Executar consulta", use_container_width=True)
     limpar_tudo = st.form_submit_button("🧹 Limpar filtros", use_container_width=True)
 
@@ -444,10 +287,8 @@ f_preview = {
 
 total_empresas = None
 if atualizar_contagem or executar_consulta:
-    (sql_count, params_count), _ = build_queries(f_preview)
     try:
-        res, _ = db.execute_query(sql_count, params_count)
-        total_empresas = int(res[0][0]) if res else 0
+        total_empresas = api.contar(f_preview)
     except Exception as e:
         st.sidebar.error(f"Erro na contagem: {e}")
         total_empresas = 0
@@ -455,6 +296,21 @@ if atualizar_contagem or executar_consulta:
 if total_empresas is not None:
     st.sidebar.success(f"**{total_empresas} empresas** com os filtros acima")
 
+if explorar:
+    try:
+        amostra = api.amostra(f_preview)
+        res_pag, colunas_pag = amostra["pagina"]
+        st.session_state.exploracao = {
+            "filtros": dict(f_preview),
+            "total": amostra["total"],
+            "por_uf": amostra["por_uf"],
+            "por_situacao": amostra["por_situacao"],
+            "pagina": pd.DataFrame(res_pag, columns=colunas_pag),
+        }
+    except Exception as e:
+        st.sidebar.error(f"Erro na exploração rápida: {e}")
+        st.session_state.exploracao = None
+
 if limpar_tudo:
     st.session_state.filtros = {
         "cnpj": "", "nome_empresa": "",  # CAMPO UNIFICADO
@@ -467,12 +323,15 @@ if limpar_tudo:
     st.session_state.cnae_resultados = []
     st.session_state.cnae_multisel_version = 0
     st.session_state.page = 1
+    st.session_state.cursores = [None]
     st.session_state.consulta_pronta = False
+    st.session_state.exploracao = None
     st.rerun()
 
 if executar_consulta:
     st.session_state.filtros = dict(f_preview)
     st.session_state.page = 1
+    st.session_state.cursores = [None]
     st.session_state.consulta_pronta = True
     st.rerun()
 
@@ -493,6 +352,39 @@ def _chips_aplicados(f):
             chips.append(f"<span class='badge badge-applied'><small>+{len(f['cnae'])-6} CNAE(s)</small></span>")
     return " ".join(chips) or "<span class='section-sub'>Nenhum filtro aplicado</span>"
 
+def _faixa(est):
+    estimativa, minimo, maximo = est
+    return f"~{estimativa:,}".replace(",", ".") + f" (IC 95%: {minimo:,} – {maximo:,})".replace(",", ".")
+
+exp = st.session_state.exploracao
+if exp:
+    st.markdown("#### ⚡ Exploração rápida (aproximada)")
+    st.caption(f"Estimativas a partir de uma amostra de {AMOSTRA_PERCENTUAL}% dos estabelecimentos, "
+               "atualizada quando a amostra é recriada (schema.py --amostra). "
+               "Use o botão abaixo para obter os números exatos com os mesmos filtros.")
+    st.metric("Empresas (estimativa)", _faixa(exp["total"]))
+    c_uf, c_sit = st.columns(2)
+    with c_uf:
+        df_uf = pd.DataFrame([(uf, *v) for uf, v in exp["por_uf"].items()],
+                             columns=["UF", "Estimativa", "Mínimo", "Máximo"])
+        st.dataframe(df_uf.sort_values("Estimativa", ascending=False), use_container_width=True, hide_index=True)
+    with c_sit:
+        df_sit = pd.DataFrame([(SITUACAO_MAP_INV.get(sit, sit), *v) for sit, v in exp["por_situacao"].items()],
+                              columns=["Situação", "Estimativa", "Mínimo", "Máximo"])
+        st.dataframe(df_sit.sort_values("Estimativa", ascending=False), use_container_width=True, hide_index=True)
+    if not exp["pagina"].empty:
+        st.caption("Exemplos da amostra")
+        st.dataframe(exp["pagina"], use_container_width=True, hide_index=True)
+    if st.button("🎯 Executar exatamente", key="exploracao_exata"):
+        st.session_state.filtros = dict(exp["filtros"])
+        st.session_state.cnaes_selecionados = list(exp["filtros"]["cnae"])
+        st.session_state.page = 1
+        st.session_state.cursores = [None]
+        st.session_state.consulta_pronta = True
+        st.session_state.exploracao = None
+        st.rerun()
+    st.markdown("---")
+
 st.markdown("#### Filtros aplicados")
 st.markdown(_chips_aplicados(st.session_state.filtros), unsafe_allow_html=True)
 st.markdown("---")
@@ -501,14 +393,15 @@ st.markdown("---")
 
 if st.session_state.consulta_pronta:
     f = st.session_state.filtros
-    limit = f["limit"]; page = st.session_state.page; offset = (page - 1) * limit
-    (_, _), (sql_select, params_select) = build_queries(f, limit=limit, offset=offset)
+    limit = f["limit"]; page = st.session_state.page
+    cursor = st.session_state.cursores[page - 1]
 
     with st.spinner("Executando consulta..."):
         try:
-            resultados, colunas = db.execute_query(sql_select, params_select)
+            resultados, colunas, proximo = api.pagina(f, limit=limit, cursor=cursor)
+            st.session_state.cursores = st.session_state.cursores[:page] + [proximo]
             if resultados:
-                df = pd.DataFrame(resultados, columns=colunas)
+                df = montar_dataframe([(colunas, resultados)])
 
                 c1, c2, c3, c4 = st.columns(4)
                 with c1: st.metric("Total nesta página", len(df))
@@ -529,7 +422,7 @@ if st.session_state.consulta_pronta:
                 if "data_inicio_atividade" in df.columns:
                     df["_data_inicio"] = pd.to_datetime(df["data_inicio_atividade"], errors="coerce")
                 if {"cnae_fiscal_principal", "cnae_descricao"}.issubset(df.columns):
-                    df["cnae_exib"] = df["cnae_fiscal_principal"].astype(str) + " – " + df["cnae_descricao"].fillna("")
+                    df["cnae_exib"] = df["cnae_fiscal_principal"].astype(str) + " – " + df["cnae_descricao"].astype(object).fillna("")
 
                 rename_map = {
                     "cnpj_formatado": "CNPJ",
@@ -569,17 +462,11 @@ if st.session_state.consulta_pronta:
                     if st.button("📥 Download CSV (todos)", use_container_width=True, key="download_todos"):
                         with st.spinner("Gerando arquivo com todos os resultados..."):
                             try:
-                                # Buscar todos os resultados sem limite
-                                (_, _), (sql_all, params_all) = build_queries(f)
-                                # Remover LIMIT e OFFSET da query
-                                sql_all = sql_all.replace("LIMIT %s OFFSET %s", "")
-                                # Remover os últimos 2 parâmetros (limit e offset)
-                                params_all = params_all[:-2]
+                                # Buscar todos os resultados sem limite (em lotes, via serviço),
+                                # montando o DataFrame coluna a coluna com tipos compactos
+                                df_all = montar_dataframe(api.exportar(f))
                                 
-                                resultados_all, _ = db.execute_query(sql_all, params_all)
-                                if resultados_all:
-                                    df_all = pd.DataFrame(resultados_all, columns=colunas)
-                                    
+                                if not df_all.empty:
                                     # Aplicar as mesmas formatações
                                     if "cnpj" in df_all.columns:
                                         df_all["cnpj_formatado"] = df_all["cnpj"].apply(formatar_cnpj)
@@ -599,27 +486,24 @@ if st.session_state.consulta_pronta:
                             except Exception as e:
                                 st.error(f"Erro ao gerar arquivo completo: {e}")
 
-                (sql_count, params_count), _ = build_queries(f)
-                res_total, _ = db.execute_query(sql_count, params_count)
-                total = int(res_total[0][0]) if res_total else None
+                try:
+                    total = api.contar(f)
+                except Exception:
+                    total = None
 
+                total_pages = max(1, (total + limit - 1) // limit) if total is not None and limit > 0 else None
                 cprev, cpage, cnext = st.columns([1, 2, 1])
                 with cprev:
                     if st.button("⬅️ Página anterior", disabled=(page <= 1)):
                         st.session_state.page = max(1, page - 1); st.rerun()
                 with cpage:
-                    if total is not None and limit > 0:
-                        total_pages = max(1, (total + limit - 1) // limit)
+                    if total_pages is not None:
                         st.write(f"Página **{page}** de **{total_pages}** — Total: **{total}**")
                     else:
                         st.write(f"Página **{page}**")
                 with cnext:
-                    disable_next = False
-                    if total is not None and limit > 0:
-                        total_pages = max(1, (total + limit - 1) // limit)
-                        disable_next = page >= total_pages
-                    else:
-                        disable_next = len(df) < limit
+                    # página cheia sempre traz cursor; na última página exata, quem decide é o total
+                    disable_next = proximo is None or (total_pages is not None and page >= total_pages)
                     if st.button("Próxima página ➡️", disabled=disable_next):
                         st.session_state.page = page + 1; st.rerun()
 
@@ -639,7 +523,7 @@ if st.session_state.consulta_pronta:
                             st.plotly_chart(px.pie(values=s.values, names=s.index, title="Situação Cadastral"), use_container_width=True)
                     with tab3:
                         if {"cnae_fiscal_principal","cnae_descricao"}.issubset(df.columns):
-                            top = (df.assign(cnae_exib=df["cnae_fiscal_principal"].astype(str) + " – " + df["cnae_descricao"].fillna(""))
+                            top = (df.assign(cnae_exib=df["cnae_fiscal_principal"].astype(str) + " – " + df["cnae_descricao"].astype(object).fillna(""))
                                      .value_counts("cnae_exib").head(10))
                             fig_c = px.bar(x=top.index, y=top.values, title="Top 10 CNAEs (página)",
                                            labels={"x": "CNAE", "y": "Quantidade"})
@@ -659,41 +543,22 @@ cnpj_detalhes = st.text_input("Digite o CNPJ completo para ver detalhes (somente
 buscar_detalhes = st.button("Buscar Detalhes")
 
 if buscar_detalhes and cnpj_detalhes:
-    cnpj_limpo = "".join(filter(str.isdigit, str(cnpj_detalhes)))
+    # guardado na sessão para o painel continuar aberto ao paginar as filiais
+    st.session_state.detalhe_cnpj = cnpj_detalhes
+    st.session_state.filiais_cursores = [None]
+    st.session_state.filiais_pagina = 1
+elif st.session_state.get("detalhe_cnpj") and cnpj_detalhes != st.session_state.detalhe_cnpj:
+    # o CNPJ digitado mudou (ou foi apagado): fecha o painel da busca anterior
+    st.session_state.detalhe_cnpj = None
+
+if st.session_state.get("detalhe_cnpj"):
+    cnpj_limpo = "".join(filter(str.isdigit, str(st.session_state.detalhe_cnpj)))
     if len(cnpj_limpo) != 14:
         st.error("CNPJ deve conter exatamente 14 dígitos")
     else:
         with st.spinner("Buscando detalhes..."):
             try:
-                query_detalhes = """
-                    SELECT
-                        emp.razao_social,
-                        est.nome_fantasia,
-                        est.cnpj,
-                        est.uf,
-                        est.municipio,
-                        est.data_inicio_atividade,
-                        est.situacao_cadastral,
-                        emp.porte_empresa,
-                        emp.capital_social,
-                        est.logradouro,
-                        est.numero,
-                        est.bairro,
-                        est.cep,
-                        est.complemento,
-                        est.ddd_1,
-                        est.telefone_1,
-                        est.correio_eletronico,
-                        est.tipo_logradouro,
-                        est.cnae_fiscal_principal,
-                        cnae.descricao AS descricao_cnae
-                    FROM estabelecimento est
-                    LEFT JOIN empresa emp ON est.cnpj_basico = emp.cnpj_basico
-                    LEFT JOIN cnae cnae
-                        ON regexp_replace(cnae.codigo::text, '\\D', '', 'g') = est.cnae_fiscal_principal::text
-                    WHERE est.cnpj = %s
-                """
-                resultado_detalhes, colunas_detalhes = db.execute_query(query_detalhes, (cnpj_limpo,))
+                resultado_detalhes, colunas_detalhes = get_detalhes(cnpj_limpo)
                 if resultado_detalhes:
                     df_d = pd.DataFrame(resultado_detalhes, columns=colunas_detalhes)
                     c1, c2 = st.columns(2)
@@ -731,6 +596,34 @@ if buscar_detalhes and cnpj_detalhes:
                         st.write(f"**CEP:** {cep_fmt}")
                         compl = df_d.get('complemento', pd.Series(['N/A'])).iloc[0]
                         st.write(f"**Complemento:** {compl}")
+
+                    st.write("**Matriz e filiais**")
+                    pag_f = st.session_state.filiais_pagina
+                    grupo = get_filiais(cnpj_limpo[:8], st.session_state.filiais_cursores[pag_f - 1])
+                    st.session_state.filiais_cursores = st.session_state.filiais_cursores[:pag_f] + [grupo["cursor"]]
+                    st.caption(f"{grupo['total']} estabelecimento(s) com a raiz {cnpj_limpo[:8]} — {grupo['ativas']} ativo(s)")
+                    if grupo["linhas"]:
+                        df_g = montar_dataframe([(grupo["colunas"], grupo["linhas"])])
+                        df_g["cnpj"] = df_g["cnpj"].apply(formatar_cnpj)
+                        df_g["situacao_cadastral"] = df_g["situacao_cadastral"].map(lambda sit: SITUACAO_MAP_INV.get(sit, sit))
+                        df_g["cnae_exib"] = df_g["cnae_fiscal_principal"].astype(str) + " – " + df_g["cnae_descricao"].astype(object).fillna("")
+                        df_g = df_g[["cnpj", "tipo", "nome_fantasia", "uf", "municipio", "situacao_cadastral", "cnae_exib"]].rename(columns={
+                            "cnpj": "CNPJ", "tipo": "Tipo", "nome_fantasia": "Nome Fantasia", "uf": "UF",
+                            "municipio": "Município (cód.)", "situacao_cadastral": "Situação", "cnae_exib": "CNAE Principal",
+                        })
+                        st.dataframe(df_g, use_container_width=True, hide_index=True)
+
+                    if grupo["total"] > FILIAIS_PAGINA:
+                        total_pag_f = (grupo["total"] + FILIAIS_PAGINA - 1) // FILIAIS_PAGINA
+                        fprev, fpage, fnext = st.columns([1, 2, 1])
+                        with fprev:
+                            if st.button("⬅️ Anteriores", key="filiais_prev", disabled=(pag_f <= 1)):
+                                st.session_state.filiais_pagina = pag_f - 1; st.rerun()
+                        with fpage:
+                            st.write(f"Página **{pag_f}** de **{total_pag_f}**")
+                        with fnext:
+                            if st.button("Próximas ➡️", key="filiais_next", disabled=(pag_f >= total_pag_f or grupo["cursor"] is None)):
+                                st.session_state.filiais_pagina = pag_f + 1; st.rerun()
                 else:
                     st.warning("Nenhuma empresa encontrada com este CNPJ.")
             except Exception as e:
@@ -0,0 +1,70 @@
+"""Exploração rápida (amostra) x contagem exata, com os mesmos filtros.
+
+Uso:
+    python schema.py --amostra          # cria estabelecimento_amostra, se ainda não existir
+    python bench_amostra.py
+    python bench_amostra.py --repeticoes 10
+
+Para cada cenário mostra o tempo das duas consultas da amostra (distribuição +
+página de exemplos), o da contagem exata de build_queries, a estimativa com o
+intervalo de ~95% e se o total exato caiu dentro dele.
+"""
+import argparse
+import statistics
+import time
+from database import Database
+from consultas import FILTROS_PADRAO, build_queries, build_queries_amostra, resumir_amostra
+
+CENARIOS = [
+    ("Sem filtro", {}),
+    ("UF", {"uf": "SP"}),
+    ("UF + Ativa", {"uf": "SP", "situacao": "Ativa"}),
+    ("UF pequena + Ativa", {"uf": "AC", "situacao": "Ativa"}),
+    ("Ativa + CNAE", {"situacao": "Ativa", "cnae": ["5611201", "5611203"]}),
+    ("UF + Ativa + porte", {"uf": "MG", "situacao": "Ativa", "porte": "Microempresa"}),
+    ("Ativa + capital", {"situacao": "Ativa", "capital_min": 10000, "capital_max": 100000}),
+]
+
+def _medir(conn, consultas_sql, repeticoes):
+    tempos, resultados = [], None
+    with conn.cursor() as cursor:
+        for _ in range(repeticoes):
+            t0 = time.perf_counter()
+            resultados = []
+            for sql, params in consultas_sql:
+                cursor.execute(sql, params)
+                resultados.append(cursor.fetchall())
+            tempos.append((time.perf_counter() - t0) * 1000)
+    return tempos, resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da exploração rápida")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    conn = Database().connect()
+    if conn is None:
+        raise SystemExit("Não foi possível conectar ao banco")
+    conn.autocommit = True
+
+    print(f"{'cenário':<22} {'amostra ms':>11} {'exata ms':>10} {'estimativa':>12} "
+          f"{'IC 95%':>25} {'exato':>10} {'no IC':>6}")
+    try:
+        for nome, extra in CENARIOS:
+            filtros = dict(FILTROS_PADRAO, **extra)
+            dist, pagina = build_queries_amostra(filtros)
+            tempos_amostra, (linhas_dist, _) = _medir(conn, [dist, pagina], args.repeticoes)
+            (estimativa, minimo, maximo), _, _ = resumir_amostra(linhas_dist)
+
+            (sql_count, params_count), _ = build_queries(filtros)
+            tempos_exata, (linhas_count,) = _medir(conn, [(sql_count, params_count)], args.repeticoes)
+            exato = linhas_count[0][0]
+
+            print(f"{nome:<22} {statistics.median(tempos_amostra):>11.1f} {statistics.median(tempos_exata):>10.1f} "
+                  f"{estimativa:>12} {f'{minimo} – {maximo}':>25} {exato:>10} "
+                  f"{'sim' if minimo <= exato <= maximo else 'não':>6}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
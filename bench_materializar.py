@@ -0,0 +1,108 @@
+"""Memória de pd.DataFrame(fetchall()) x resultados.montar_dataframe em lotes.
+
+Uso:
+    python bench_materializar.py --sintetico                 # 1M linhas geradas, sem banco
+    python bench_materializar.py --uf SP --linhas 1000000    # exportação real (build_query_export)
+
+Mostra, para cada forma, bytes por linha do DataFrame final (memory_usage deep)
+e o pico de memória alocada durante a montagem (tracemalloc), também por linha.
+"""
+import argparse
+import datetime
+import decimal
+import gc
+import random
+import time
+import tracemalloc
+import pandas as pd
+from consultas import FILTROS_PADRAO, build_query_export
+from resultados import montar_dataframe, bytes_por_linha
+
+COLUNAS = [
+    "razao_social", "nome_fantasia", "cnpj", "uf", "data_inicio_atividade", "situacao_cadastral",
+    "porte_empresa", "capital_social", "municipio", "cnae_fiscal_principal", "cnae_descricao",
+]
+UFS = ["AC", "AL", "AM", "AP", "BA", "CE", "DF", "ES", "GO", "MA", "MG", "MS", "MT", "PA",
+       "PB", "PE", "PI", "PR", "RJ", "RN", "RO", "RR", "RS", "SC", "SE", "SP", "TO"]
+
+def _linhas_sinteticas(n, semente=1):
+    rng = random.Random(semente)
+    cnaes = [(str(1000000 + i * 7), f"Atividade econômica número {i}") for i in range(1300)]
+    municipios = [str(1000 + i) for i in range(5570)]
+    inicio = datetime.date(1970, 1, 1)
+    for i in range(n):
+        cnae, descricao = rng.choice(cnaes)
+        yield (
+            f"EMPRESA {rng.randrange(10**8)} LTDA",
+            rng.choice([None, f"FANTASIA {rng.randrange(10**6)}"]),
+            f"{rng.randrange(10**14):014d}",
+            rng.choice(UFS),
+            inicio + datetime.timedelta(days=rng.randrange(20000)),
+            rng.choice([2, 2, 2, 3, 4, 8]),
+            rng.choice(["01", "03", "05"]),
+            decimal.Decimal(rng.randrange(10**8)) / 100,
+            rng.choice(municipios),
+            cnae,
+            descricao,
+        )
+
+def _lotes_sinteticos(n, lote):
+    buffer = []
+    for linha in _linhas_sinteticas(n):
+        buffer.append(linha)
+        if len(buffer) == lote:
+            yield COLUNAS, buffer
+            buffer = []
+    if buffer:
+        yield COLUNAS, buffer
+
+def _medir(montar):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    df = montar()
+    segundos = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, pico, segundos
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória da montagem de DataFrames")
+    parser.add_argument("--sintetico", action="store_true", help="gera as linhas em vez de consultar o banco")
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--lote", type=int, default=5000)
+    parser.add_argument("--uf", default="Todos")
+    parser.add_argument("--situacao", default="Todos")
+    args = parser.parse_args()
+
+    if args.sintetico:
+        def antes():
+            linhas = list(_linhas_sinteticas(args.linhas))
+            return pd.DataFrame(linhas, columns=COLUNAS)
+
+        def depois():
+            return montar_dataframe(_lotes_sinteticos(args.linhas, args.lote))
+    else:
+        from database import Database
+        db = Database()
+        filtros = dict(FILTROS_PADRAO, uf=args.uf, situacao=args.situacao, sem_limite_capital=True)
+        sql, params = build_query_export(filtros)
+        sql += f" LIMIT {int(args.linhas)}"
+
+        def antes():
+            linhas, colunas = db.execute_query(sql, params)
+            return pd.DataFrame(linhas, columns=colunas)
+
+        def depois():
+            return montar_dataframe(db.iter_query(sql, params, lote=args.lote))
+
+    print(f"{'forma':<32} {'linhas':>9} {'bytes/linha (df)':>17} {'pico/linha':>11} {'pico MB':>9} {'s':>7}")
+    for nome, montar in (("DataFrame(fetchall) object", antes), ("montar_dataframe (lotes)", depois)):
+        df, pico, segundos = _medir(montar)
+        n = max(1, len(df))
+        print(f"{nome:<32} {len(df):>9} {bytes_por_linha(df):>17.1f} {pico / n:>11.1f} "
+              f"{pico / 2**20:>9.1f} {segundos:>7.1f}")
+        del df
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compara a contagem de build_queries entre a tabela única e a particionada.
+
+Uso:
+    python bench_particionamento.py
+    python bench_particionamento.py --unica estabelecimento_heap --particionada estabelecimento
+
+Antes da troca (schema.py sem --trocar) os padrões já servem:
+estabelecimento (heap) x estabelecimento_part.
+"""
+import argparse
+import statistics
+import time
+from database import Database
+from consultas import FILTROS_PADRAO, build_queries
+
+FILTROS_BASE = dict(FILTROS_PADRAO, sem_limite_capital=True)
+
+CENARIOS = [
+    ("UF", {"uf": "SP"}),
+    ("UF + Ativa", {"uf": "SP", "situacao": "Ativa"}),
+    ("UF + Ativa + CNAE", {"uf": "SP", "situacao": "Ativa", "cnae": ["5611201", "5611203"]}),
+    ("UF pequena + Ativa", {"uf": "AC", "situacao": "Ativa"}),
+    ("Ativa (todas as UFs)", {"situacao": "Ativa"}),
+    ("UF + Ativa + capital", {"uf": "MG", "situacao": "Ativa", "sem_limite_capital": False,
+                              "capital_min": 10000, "capital_max": 100000}),
+    # código RFB (tabela TOM) de São Paulo; na particionada a UF é derivada do município
+    ("Cidade (sem UF)", {"cidade": "7107"}),
+    ("Cidade (sem UF) + Ativa", {"cidade": "7107", "situacao": "Ativa"}),
+]
+
+def _medir(conn, sql, params, repeticoes):
+    tempos = []
+    with conn.cursor() as cursor:
+        for _ in range(repeticoes):
+            t0 = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            tempos.append((time.perf_counter() - t0) * 1000)
+    return tempos
+
+def _particoes_varridas(conn, sql, params):
+    # ANALYZE: a poda feita na execução (UF derivada da cidade) só aparece como
+    # partições nunca executadas (Actual Loops = 0)
+    with conn.cursor() as cursor:
+        cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+        plano = cursor.fetchone()[0]
+    nomes = set()
+
+    def visitar(no):
+        if ("Relation Name" in no and no.get("Alias", "").startswith("est")
+                and no.get("Actual Loops", 1) > 0):
+            nomes.add(no["Relation Name"])
+        for filho in no.get("Plans", []):
+            visitar(filho)
+
+    visitar(plano[0]["Plan"])
+    return len(nomes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tabela única x particionada")
+    parser.add_argument("--unica", default="estabelecimento")
+    parser.add_argument("--particionada", default="estabelecimento_part")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    conn = Database().connect()
+    if conn is None:
+        raise SystemExit("Não foi possível conectar ao banco")
+    conn.autocommit = True
+
+    print(f"{'cenário':<24} {'layout':<12} {'tabelas':>7} {'mediana ms':>11} {'mín ms':>9} {'linhas':>10}")
+    try:
+        for nome, extra in CENARIOS:
+            filtros = dict(FILTROS_BASE, **extra)
+            for layout, tabela, podar in (("única", args.unica, False), ("particionada", args.particionada, True)):
+                (sql_count, params_count), _ = build_queries(filtros, tabela_est=tabela, podar_por_cidade=podar)
+                tempos = _medir(conn, sql_count, params_count, args.repeticoes)
+                with conn.cursor() as cursor:
+                    cursor.execute(sql_count, params_count)
+                    total = cursor.fetchone()[0]
+                varridas = _particoes_varridas(conn, sql_count, params_count)
+                print(f"{nome:<24} {layout:<12} {varridas:>7} {statistics.median(tempos):>11.1f} "
+                      f"{min(tempos):>9.1f} {total:>10}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
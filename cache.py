@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import defaultdict
+
+class CacheTTL:
+    """Cache de processo no estilo de st.cache_data, com contadores por função.
+
+    ttls: {nome_da_funcao: segundos ou None (sem expiração)}.
+    agrupar_faltas=True faz faltas concorrentes na mesma chave esperarem o
+    primeiro cálculo em vez de irem todas ao banco (evita stampede).
+    """
+
+    def __init__(self, ttls: dict, agrupar_faltas: bool = False, max_itens: int = None):
+        self.ttls = ttls
+        self.agrupar_faltas = agrupar_faltas
+        self.max_itens = max_itens
+        self.dados = {}
+        self.calculando = {}
+        self.acertos = defaultdict(int)
+        self.faltas = defaultdict(int)
+        self.stampedes = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def _valido(self, nome, entrada):
+        ttl = self.ttls.get(nome)
+        return entrada is not None and (ttl is None or time.monotonic() - entrada[0] < ttl)
+
+    def chamar(self, nome, func, *args):
+        # como no st.cache_data, a chave são só os argumentos (não a conexão)
+        chave = (nome, args)
+        while True:
+            with self.lock:
+                entrada = self.dados.get(chave)
+                if self._valido(nome, entrada):
+                    self.acertos[nome] += 1
+                    return entrada[1]
+                em_andamento = self.calculando.get(chave)
+                if em_andamento is None:
+                    self.faltas[nome] += 1
+                    evento = self.calculando[chave] = threading.Event()
+                    break
+                if not self.agrupar_faltas:
+                    self.faltas[nome] += 1
+                    self.stampedes[nome] += 1
+                    evento = None
+                    break
+            # outra thread já está calculando esta chave: espera e relê
+            em_andamento.wait()
+
+        try:
+            valor = func(*args)
+            with self.lock:
+                if self.max_itens and len(self.dados) >= self.max_itens and chave not in self.dados:
+                    self.dados.pop(next(iter(self.dados)))
+                self.dados[chave] = (time.monotonic(), valor)
+            return valor
+        finally:
+            if evento is not None:
+                with self.lock:
+                    self.calculando.pop(chave, None)
+                evento.set()
+
+    def estatisticas(self):
+        with self.lock:
+            nomes = set(self.acertos) | set(self.faltas)
+            return {nome: {"acertos": self.acertos[nome], "faltas": self.faltas[nome],
+                           "stampedes": self.stampedes[nome]} for nome in sorted(nomes)}
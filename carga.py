@@ -0,0 +1,320 @@
+"""Teste de carga: N usuários virtuais repetindo uma sessão típica da app.
+
+Cada usuário (uma thread) faz, em loop até acabar o tempo:
+abrir a app -> digitar um termo de CNAE -> adicionar CNAEs -> atualizar contagem
+-> executar consulta -> paginar 5 vezes -> abrir um detalhe.
+
+Com --servico, cada usuário usa ClienteConsultas contra um servico.py já em
+execução, o mesmo caminho da app (HTTP -> cache e pool do serviço); o
+relatório traz as estatísticas de /cache do serviço durante o teste. Sem
+--servico, as consultas de consultas.py rodam direto no banco, sem o serviço,
+para comparar.
+
+Em ambos os modos, as funções que a app decora com st.cache_data passam por um
+cache compartilhado equivalente, e cada rerun do Streamlit volta a chamar as
+funções cacheadas do topo do script, o que também é reproduzido.
+
+Uso:
+    python servico.py --conexoes 10 &
+    python carga.py --servico --usuarios 40 --duracao 120 --rampa 20
+    python carga.py --usuarios 40 --duracao 120 --pool 10     # direto no banco
+"""
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+from database import Database, PooledDatabase
+from cache import CacheTTL
+from cliente import ClienteConsultas
+from config import SERVICO_URL, ESTABELECIMENTO_PARTICIONADA
+import consultas
+from consultas import ErroConsulta
+
+TERMOS_CNAE = ["sorvete", "restaurante", "padaria", "farmácia", "academia", "software",
+               "transporte", "construção", "cabeleireiro", "comércio varejista"]
+UFS_SESSAO = ["SP", "MG", "RJ", "PR", "RS", "BA", "SC", "GO", "PE", "CE"]
+PAGINAS = 5
+LIMITE_PAGINA = 100
+
+FILTROS_BASE = dict(consultas.FILTROS_PADRAO, limit=LIMITE_PAGINA)
+
+# TTL (segundos) de cada função que a app decora com st.cache_data; None = sem expiração
+TTL_CACHE = {
+    "get_ufs": None, "get_cidades": None, "get_portes": None, "get_capital_range": None,
+    "get_cnae_infos": 600, "sugerir_cnae": 600, "get_detalhes": 600,
+}
+
+class Metricas:
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+        self.sessoes = 0
+        self.lock = threading.Lock()
+
+    def registrar(self, passo, ms, erro=False):
+        with self.lock:
+            self.latencias[passo].append(ms)
+            if erro:
+                self.erros[passo] += 1
+
+class MonitorConexoes(threading.Thread):
+    """Amostra pg_stat_activity do banco da app enquanto o teste roda."""
+
+    SQL = """
+        SELECT COUNT(*),
+               COUNT(*) FILTER (WHERE state = 'active'),
+               COUNT(*) FILTER (WHERE wait_event_type = 'Lock'),
+               current_setting('max_connections')::int
+        FROM pg_stat_activity
+        WHERE datname = current_database() AND pid <> pg_backend_pid()
+    """
+
+    def __init__(self, intervalo: float):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.amostras = []
+        self.max_connections = None
+        self.parar = threading.Event()
+
+    def run(self):
+        conn = Database().connect()
+        if conn is None:
+            return
+        conn.autocommit = True
+        try:
+            while not self.parar.is_set():
+                with conn.cursor() as cursor:
+                    cursor.execute(self.SQL)
+                    total, ativas, em_lock, self.max_connections = cursor.fetchone()
+                self.amostras.append((total, ativas, em_lock))
+                self.parar.wait(self.intervalo)
+        finally:
+            conn.close()
+
+def _consulta(db, sql, params):
+    # Database.execute_query devolve (None, None) quando falha
+    resultado, colunas = db.execute_query(sql, params)
+    if resultado is None:
+        raise ErroConsulta(sql.strip().splitlines()[0])
+    return resultado, colunas
+
+class ConsultasDiretas:
+    """Mesma interface de ClienteConsultas, executando consultas.py direto no banco."""
+
+    def __init__(self, db: Database = None):
+        self.db = db or Database()
+        self.unaccent = None
+
+    def saude(self):
+        return {"ok": True}
+
+    def get_ufs(self):
+        return consultas.get_ufs(self.db)
+
+    def get_cidades(self, uf=None):
+        return consultas.get_cidades(self.db, uf)
+
+    def get_portes(self):
+        return consultas.get_portes(self.db)
+
+    def get_capital_range(self):
+        return consultas.get_capital_range(self.db)
+
+    def get_cnae_infos(self, codigos):
+        return consultas.get_cnae_infos(self.db, list(codigos))
+
+    def sugerir_cnae(self, termo, limit=consultas.SUGGEST_LIMIT):
+        if self.unaccent is None:
+            self.unaccent = consultas.has_unaccent(self.db)
+        return consultas.sugerir_cnae(self.db, termo, limit, unaccent=self.unaccent)
+
+    def contar(self, filtros):
+        (sql_count, params_count), _ = consultas.build_queries(filtros, podar_por_cidade=ESTABELECIMENTO_PARTICIONADA)
+        res, _ = _consulta(self.db, sql_count, params_count)
+        return int(res[0][0]) if res else 0
+
+    def pagina(self, filtros, limit=100, cursor=None):
+        sql, params = consultas.build_query_keyset(filtros, limit, cursor,
+                                              podar_por_cidade=ESTABELECIMENTO_PARTICIONADA)
+        linhas, colunas = _consulta(self.db, sql, params)
+        proximo = consultas.proximo_cursor(linhas, colunas) if len(linhas) == limit else None
+        return linhas, colunas, proximo
+
+    def detalhes(self, cnpjs):
+        resultado, colunas = consultas.get_detalhes_lote(self.db, list(cnpjs))
+        if resultado is None:
+            raise ErroConsulta("detalhes")
+        return resultado, colunas
+
+class UsuarioVirtual:
+    def __init__(self, api, cache: CacheTTL, metricas: Metricas, pensar: float, semente: int):
+        self.api = api  # ClienteConsultas ou ConsultasDiretas
+        self.cache = cache
+        self.metricas = metricas
+        self.pensar = pensar
+        self.rng = random.Random(semente)
+
+    def _passo(self, nome, func=None, cnaes=()):
+        t0 = time.perf_counter()
+        try:
+            self._rerun(cnaes)
+            resultado = func() if func else None
+            self.metricas.registrar(nome, (time.perf_counter() - t0) * 1000)
+            return resultado
+        except Exception:
+            self.metricas.registrar(nome, (time.perf_counter() - t0) * 1000, erro=True)
+            return None
+        finally:
+            if self.pensar:
+                time.sleep(self.rng.uniform(0, self.pensar))
+
+    def _rerun(self, cnaes=()):
+        # topo do script: o que a app recalcula (ou pega do cache) a cada interação
+        c, api = self.cache, self.api
+        api.saude()
+        c.chamar("get_cidades", lambda: api.get_cidades())
+        c.chamar("get_ufs", lambda: api.get_ufs())
+        c.chamar("get_portes", lambda: api.get_portes())
+        c.chamar("get_capital_range", lambda: api.get_capital_range())
+        c.chamar("get_cnae_infos", lambda cods: api.get_cnae_infos(list(cods)), tuple(cnaes))
+
+    def _sugerir(self, termo):
+        return self.cache.chamar("sugerir_cnae", lambda t: self.api.sugerir_cnae(t, consultas.SUGGEST_LIMIT), termo)
+
+    def _pagina(self, filtros, cursor):
+        # a app executa a página e, em seguida, a contagem para o paginador
+        linhas, colunas, proximo = self.api.pagina(filtros, limit=LIMITE_PAGINA, cursor=cursor)
+        self.api.contar(filtros)
+        return linhas, colunas, proximo
+
+    def _detalhe(self, cnpj):
+        return self.cache.chamar("get_detalhes", lambda c: self.api.detalhes([c]), cnpj)
+
+    def sessao(self):
+        termo = self.rng.choice(TERMOS_CNAE)
+        filtros = dict(FILTROS_BASE, uf=self.rng.choice(UFS_SESSAO), situacao="Ativa")
+
+        self._passo("abrir")
+        sugestoes = self._passo("digitar_cnae", lambda: self._sugerir(termo)) or []
+        cnaes = [cod for cod, _, _ in sugestoes[:self.rng.randint(1, 3)]]
+        filtros["cnae"] = cnaes
+        self._passo("adicionar_cnaes", cnaes=cnaes)
+        self._passo("contar", lambda: self.api.contar(filtros), cnaes)
+        pagina = self._passo("executar", lambda: self._pagina(filtros, None), cnaes)
+        cnpjs, cursor = [], None
+        if pagina:
+            linhas, colunas, cursor = pagina
+            idx = colunas.index("cnpj")
+            cnpjs = [linha[idx] for linha in linhas]
+        for _ in range(PAGINAS):
+            if cursor is None:
+                break
+            pagina = self._passo("paginar", lambda c=cursor: self._pagina(filtros, c), cnaes)
+            cursor = pagina[2] if pagina else None
+        if cnpjs:
+            cnpj = self.rng.choice(cnpjs)
+            self._passo("detalhe", lambda: self._detalhe(cnpj), cnaes)
+
+        with self.metricas.lock:
+            self.metricas.sessoes += 1
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    idx = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[idx]
+
+def _tabela_cache(titulo, estatisticas):
+    print(f"\n{titulo:<20} {'acertos':>8} {'faltas':>7} {'taxa':>7} {'stampede':>9}")
+    for nome, e in estatisticas.items():
+        acertos, faltas = e["acertos"], e["faltas"]
+        if not acertos + faltas:
+            continue
+        print(f"{nome:<20} {acertos:>8} {faltas:>7} {acertos / (acertos + faltas):>7.1%} {e['stampedes']:>9}")
+
+def _delta_cache(antes, depois):
+    delta = {}
+    for nome, contadores in depois.items():
+        anteriores = antes.get(nome, {})
+        delta[nome] = {k: v - anteriores.get(k, 0) for k, v in contadores.items()}
+    return delta
+
+def relatorio(metricas: Metricas, cache: CacheTTL, monitor: MonitorConexoes, duracao: float,
+              cache_servico: dict = None):
+    total_passos = sum(len(v) for v in metricas.latencias.values())
+    print(f"\nDuração: {duracao:.1f}s — sessões completas: {metricas.sessoes} "
+          f"({metricas.sessoes / duracao:.2f}/s) — passos: {total_passos} ({total_passos / duracao:.2f}/s)")
+
+    print(f"\n{'passo':<16} {'n':>6} {'erros':>6} {'p50 ms':>9} {'p90 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    ordem = ["abrir", "digitar_cnae", "adicionar_cnaes", "contar", "executar", "paginar", "detalhe"]
+    for passo in ordem:
+        v = metricas.latencias.get(passo, [])
+        print(f"{passo:<16} {len(v):>6} {metricas.erros.get(passo, 0):>6} "
+              + " ".join(f"{_percentil(v, p):>9.1f}" for p in (50, 90, 95, 99))
+              + f" {max(v, default=0):>9.1f}")
+
+    if monitor.amostras:
+        totais = [a[0] for a in monitor.amostras]
+        print(f"\nConexões no banco: pico {max(totais)} / média {sum(totais) / len(totais):.1f} "
+              f"(max_connections = {monitor.max_connections}); "
+              f"pico ativas {max(a[1] for a in monitor.amostras)}; "
+              f"pico esperando lock {max(a[2] for a in monitor.amostras)}")
+    else:
+        print("\nConexões no banco: sem amostras (monitor não conectou)")
+
+    # st.cache_data da app (simulado) e, com --servico, o cache do serviço atrás dele
+    _tabela_cache("st.cache_data (app)", cache.estatisticas())
+    if cache_servico is not None:
+        _tabela_cache("cache do serviço", cache_servico)
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga com usuários virtuais da app")
+    parser.add_argument("--usuarios", type=int, default=10)
+    parser.add_argument("--duracao", type=float, default=60, help="segundos")
+    parser.add_argument("--rampa", type=float, default=5, help="segundos para iniciar todos os usuários")
+    parser.add_argument("--pensar", type=float, default=0.5, help="pausa máxima entre passos (s)")
+    parser.add_argument("--amostragem", type=float, default=1.0, help="intervalo do monitor de conexões (s)")
+    parser.add_argument("--semente", type=int, default=1)
+    parser.add_argument("--servico", nargs="?", const=SERVICO_URL, default=None, metavar="URL",
+                        help=f"usa o serviço de consultas já em execução (padrão {SERVICO_URL})")
+    parser.add_argument("--pool", type=int, default=0,
+                        help="sem --servico: compartilha um pool com N conexões (0 = uma conexão por consulta)")
+    args = parser.parse_args()
+
+    cache = CacheTTL(TTL_CACHE)
+    if args.servico:
+        cliente = ClienteConsultas(args.servico)
+        cache_antes = cliente.estatisticas_cache()
+        db = None
+    else:
+        db = PooledDatabase(maxconn=args.pool) if args.pool else None
+    metricas = Metricas()
+    monitor = MonitorConexoes(args.amostragem)
+    monitor.start()
+
+    inicio = time.monotonic()
+    fim = inicio + args.duracao
+
+    def rodar(i):
+        time.sleep(args.rampa * i / max(1, args.usuarios))
+        api = ClienteConsultas(args.servico) if args.servico else ConsultasDiretas(db)
+        usuario = UsuarioVirtual(api, cache, metricas, args.pensar, args.semente + i)
+        while time.monotonic() < fim:
+            usuario.sessao()
+
+    threads = [threading.Thread(target=rodar, args=(i,), daemon=True) for i in range(args.usuarios)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    monitor.parar.set()
+    monitor.join()
+    duracao = time.monotonic() - inicio
+    cache_servico = _delta_cache(cache_antes, cliente.estatisticas_cache()) if args.servico else None
+    relatorio(metricas, cache, monitor, duracao, cache_servico)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Cliente Python do serviço de consultas (servico.py). Só usa a biblioteca padrão."""
+import json
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError, URLError
+from config import SERVICO_URL
+
+class ErroServico(Exception):
+    pass
+
+class ClienteConsultas:
+    def __init__(self, url: str = SERVICO_URL, timeout: float = 300):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _abrir(self, caminho, corpo=None, **params):
+        url = self.url + caminho
+        if params:
+            url += "?" + urlencode({k: v for k, v in params.items() if v is not None})
+        dados = None if corpo is None else json.dumps(corpo).encode()
+        req = Request(url, data=dados, headers={"Content-Type": "application/json"})
+        try:
+            return urlopen(req, timeout=self.timeout)
+        except HTTPError as e:
+            try:
+                mensagem = json.loads(e.read()).get("erro", e.reason)
+            except Exception:
+                mensagem = e.reason
+            raise ErroServico(f"{caminho}: {mensagem}") from None
+        except (URLError, OSError) as e:
+            # serviço fora do ar, conexão recusada ou tempo esgotado
+            motivo = getattr(e, "reason", e)
+            raise ErroServico(f"serviço indisponível em {self.url}: {motivo}") from None
+
+    def _json(self, caminho, corpo=None, **params):
+        with self._abrir(caminho, corpo, **params) as resp:
+            return json.loads(resp.read())
+
+    def _ndjson(self, caminho, corpo):
+        with self._abrir(caminho, corpo) as resp:
+            for linha in resp:
+                if linha.strip():
+                    item = json.loads(linha)
+                    if isinstance(item, dict) and "erro" in item:
+                        raise ErroServico(f"{caminho}: {item['erro']}")
+                    yield item
+
+    def _tabela(self, caminho, corpo):
+        """(linhas, colunas, extra) de uma resposta NDJSON; extra é o último dict, se houver."""
+        colunas, linhas, extra = [], [], {}
+        for item in self._ndjson(caminho, corpo):
+            if isinstance(item, dict):
+                if "colunas" in item:
+                    colunas = item["colunas"]
+                else:
+                    extra = item
+            else:
+                linhas.append(tuple(item))
+        return linhas, colunas, extra
+
+    def saude(self):
+        return self._json("/saude")
+
+    # --- listas e sugestões ---
+
+    def get_ufs(self):
+        return self._json("/ufs")
+
+    def get_cidades(self, uf=None):
+        return self._json("/cidades", uf=uf)
+
+    def get_portes(self):
+        return self._json("/portes")
+
+    def get_capital_range(self):
+        return tuple(self._json("/capital"))
+
+    def get_cnae_infos(self, codigos):
+        if not codigos:
+            return {}
+        return self._json("/cnae/infos", codigos=",".join(codigos))
+
+    def sugerir_cnae(self, termo, limit=20):
+        return [tuple(r) for r in self._json("/sugestoes/cnae", termo=termo, limit=limit)]
+
+    def sugerir_nome_empresa(self, termo, limit=12):
+        return [tuple(r) for r in self._json("/sugestoes/nome", termo=termo, limit=limit)]
+
+    def filiais(self, cnpj_basico, cursor=None, limit=50):
+        """Matriz e filiais: {"total", "ativas", "linhas", "colunas", "cursor"} (cursor None = última página)."""
+        r = self._json("/filiais", cnpj_basico=cnpj_basico, cursor=cursor, limit=limit)
+        r["linhas"] = [tuple(l) for l in r["linhas"]]
+        return r
+
+    def estatisticas_cache(self):
+        """{função: {"acertos", "faltas", "stampedes"}} do cache do serviço."""
+        return self._json("/cache")
+
+    # --- consultas com filtros ---
+
+    def contar(self, filtros):
+        return self._json("/contagem", {"filtros": filtros})["total"]
+
+    def facetas(self, filtros, campos=("uf", "situacao_cadastral")):
+        return self._json("/facetas", {"filtros": filtros, "campos": list(campos)})
+
+    def amostra(self, filtros):
+        """Exploração rápida: {"total", "por_uf", "por_situacao", "pagina": (linhas, colunas)}."""
+        r = self._json("/amostra", {"filtros": filtros})
+        return {
+            "total": tuple(r["total"]),
+            "por_uf": {uf: tuple(est) for uf, *est in r["por_uf"]},
+            "por_situacao": {sit: tuple(est) for sit, *est in r["por_situacao"]},
+            "pagina": ([tuple(l) for l in r["pagina"]["linhas"]], r["pagina"]["colunas"]),
+        }
+
+    def pagina(self, filtros, limit=100, cursor=None):
+        """(linhas, colunas, próximo cursor ou None)."""
+        linhas, colunas, extra = self._tabela("/pagina", {"filtros": filtros, "limit": limit, "cursor": cursor})
+        return linhas, colunas, extra.get("cursor")
+
+    def detalhes(self, cnpjs):
+        linhas, colunas, _ = self._tabela("/detalhes", {"cnpjs": list(cnpjs)})
+        return linhas, colunas
+
+    def exportar(self, filtros, lote=5000):
+        """Gera (colunas, linhas) em lotes, no mesmo formato de Database.iter_query."""
+        colunas, linhas = [], []
+        for item in self._ndjson("/exportar", {"filtros": filtros}):
+            if isinstance(item, dict):
+                colunas = item.get("colunas", colunas)
+                continue
+            linhas.append(tuple(item))
+            if len(linhas) >= lote:
+                yield colunas, linhas
+                linhas = []
+        if linhas:
+            yield colunas, linhas
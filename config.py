@@ -9,4 +9,11 @@ DB_CONFIG = {
     'user': os.getenv('DB_USER', 'postgres'),
     'password': os.getenv('DB_PASSWORD', 'k9p9u8a8'),
     'port': os.getenv('DB_PORT', '5432')
-}
\ No newline at end of file
+}
+
+SERVICO_HOST = os.getenv('SERVICO_HOST', '127.0.0.1')
+SERVICO_PORTA = int(os.getenv('SERVICO_PORTA', '8765'))
+SERVICO_URL = os.getenv('SERVICO_URL', f'http://{SERVICO_HOST}:{SERVICO_PORTA}')
+
+# 1 depois de schema.py --trocar: estabelecimento particionada por UF
+ESTABELECIMENTO_PARTICIONADA = os.getenv('ESTABELECIMENTO_PARTICIONADA', '0') == '1'
\ No newline at end of file
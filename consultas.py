@@ -0,0 +1,488 @@
+_MAPEAMENTO_PORTE_FWD = {"01": "Microempresa", "03": "Empresa de Pequeno Porte", "05": "Demais"}
+_MAPEAMENTO_PORTE_REV = {"Microempresa": "01", "Empresa de Pequeno Porte": "03", "Demais": "05"}
+
+SITUACAO_MAP = {"Ativa": 2, "Baixada": 3, "Suspensa": 4, "Inapta": 8, "Nula": 5}
+SITUACAO_MAP_INV = {v: k for k, v in SITUACAO_MAP.items()}
+
+class ErroConsulta(Exception):
+    pass
+
+FILTROS_PADRAO = {
+    "cnpj": "", "nome_empresa": "", "cidade": "Todos",
+    "uf": "Todos", "porte": "Todos", "situacao": "Todos",
+    "cnae": [], "capital_min": 0, "capital_max": 500000,
+    "sem_limite_capital": False, "limit": 100,
+}
+
+def build_where(filtros: dict, tabela_est: str = "estabelecimento", alias_emp: str = "emp",
+                podar_por_cidade: bool = False):
+    # alias_emp: onde estão as colunas de empresa ("est" na amostra pré-juntada)
+    # podar_por_cidade: só para estabelecimento particionada (ver abaixo)
+    base_where = "WHERE 1=1"
+    params = []
+
+    # Chaves de particionamento (ver schema.py): comparações diretas da coluna
+    # com um valor, sem cast/função, para o planner podar partições.
+    if filtros["uf"] != "Todos":
+        base_where += " AND est.uf = %s"
+        params.append(filtros["uf"])
+    if filtros["situacao"] != "Todos":
+        base_where += " AND est.situacao_cadastral = %s"
+        params.append(SITUACAO_MAP[filtros["situacao"]])
+
+    if filtros["cnpj"]:
+        base_where += " AND est.cnpj ILIKE %s"
+        params.append(f"%{filtros['cnpj']}%")
+
+    # MODIFICAÇÃO: Campo unificado para Razão Social e Nome Fantasia
+    if filtros["nome_empresa"]:
+        base_where += f" AND ({alias_emp}.razao_social ILIKE %s OR est.nome_fantasia ILIKE %s)"
+        params.append(f"%{filtros['nome_empresa']}%")
+        params.append(f"%{filtros['nome_empresa']}%")
+
+    # NOVO FILTRO: Cidade
+    if filtros["cidade"] != "Todos":
+        base_where += " AND est.municipio = %s"
+        params.append(filtros["cidade"])
+        if podar_por_cidade and filtros["uf"] == "Todos":
+            # O código do município é único no país: a UF vem de um estabelecimento
+            # dele (índice em municipio criado pelo schema.py) e a tabela
+            # particionada poda as demais UFs na execução. Na tabela única não há
+            # poda nem esse índice, por isso só com podar_por_cidade.
+            base_where += (f" AND est.uf = (SELECT m.uf FROM {tabela_est} m"
+                           f" WHERE m.municipio = %s AND m.uf IS NOT NULL LIMIT 1)")
+            params.append(filtros["cidade"])
+
+    if filtros["cnae"] and "Todos" not in filtros["cnae"]:
+        placeholders = ", ".join(["%s"] * len(filtros["cnae"]))
+        base_where += f" AND est.cnae_fiscal_principal::text IN ({placeholders})"
+        params.extend(filtros["cnae"])
+    if filtros["porte"] != "Todos":
+        porte_codigo = _MAPEAMENTO_PORTE_REV.get(filtros["porte"], filtros["porte"])
+        base_where += f" AND COALESCE(LPAD({alias_emp}.porte_empresa::text, 2, '0'), '') = %s"
+        params.append(str(porte_codigo).zfill(2))
+    if not filtros.get("sem_limite_capital", False):
+        base_where += f" AND {alias_emp}.capital_social BETWEEN %s AND %s"
+        params.append(filtros["capital_min"])
+        params.append(filtros["capital_max"])
+    else:
+        base_where += f" AND {alias_emp}.capital_social > 0"
+    return base_where, params
+
+def get_ufs(db):
+    try:
+        result, _ = db.execute_query("SELECT DISTINCT uf FROM estabelecimento WHERE uf IS NOT NULL ORDER BY uf")
+        return [r[0] for r in result] if result else []
+    except Exception:
+        return []
+
+def get_cidades(db, uf=None):
+    try:
+        if uf and uf != "Todos":
+            sql = "SELECT DISTINCT municipio FROM estabelecimento WHERE uf = %s AND municipio IS NOT NULL ORDER BY municipio"
+            result, _ = db.execute_query(sql, (uf,))
+        else:
+            sql = "SELECT DISTINCT municipio FROM estabelecimento WHERE municipio IS NOT NULL ORDER BY municipio"
+            result, _ = db.execute_query(sql)
+        return [r[0] for r in result] if result else []
+    except Exception:
+        return []
+
+def get_portes(db):
+    """Códigos de porte_empresa distintos (sem tradução)."""
+    try:
+        result, _ = db.execute_query("SELECT DISTINCT porte_empresa FROM empresa WHERE porte_empresa IS NOT NULL ORDER BY porte_empresa")
+        return [r[0] for r in result] if result else []
+    except Exception:
+        return []
+
+def get_capital_range(db):
+    try:
+        result, _ = db.execute_query("""
+            SELECT PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY capital_social) AS p95
+            FROM empresa
+            WHERE capital_social IS NOT NULL AND capital_social > 0
+        """)
+        if result and result[0] and result[0][0] and result[0][0] > 0:
+            return 0, float(result[0][0])
+        return 0, 500000
+    except Exception:
+        return 0, 250000
+
+def get_cnae_infos(db, codigos):
+    """Mapa codigo_limpo -> descrição."""
+    if not codigos:
+        return {}
+    placeholders = ", ".join(["%s"] * len(codigos))
+    sql = f"""
+        SELECT regexp_replace(c.codigo::text, '\\D', '', 'g') AS codigo_limpo, c.descricao
+        FROM cnae c
+        WHERE regexp_replace(c.codigo::text, '\\D', '', 'g') IN ({placeholders})
+    """
+    res, _ = db.execute_query(sql, codigos)
+    return {row[0]: row[1] for row in (res or [])}
+
+SUGGEST_LIMIT = 20
+
+def _sql_sugerir_cnae_unaccent():
+    return """
+        SELECT
+            regexp_replace(c.codigo::text, '\\D', '', 'g') AS codigo_limpo,
+            c.descricao,
+            COUNT(est.cnpj) AS empresas
+        FROM cnae c
+        LEFT JOIN estabelecimento est
+          ON est.cnae_fiscal_principal::text = regexp_replace(c.codigo::text, '\\D', '', 'g')
+        WHERE unaccent(lower(c.descricao)) LIKE unaccent(lower(%s))
+        GROUP BY 1,2
+        ORDER BY empresas DESC, codigo_limpo
+        LIMIT %s
+    """
+
+def _sql_sugerir_cnae_fallback():
+    return """
+        SELECT
+            regexp_replace(c.codigo::text, '\\D', '', 'g') AS codigo_limpo,
+            c.descricao,
+            COUNT(est.cnpj) AS empresas
+        FROM cnae c
+        LEFT JOIN estabelecimento est
+          ON est.cnae_fiscal_principal::text = regexp_replace(c.codigo::text, '\\D', '', 'g')
+        WHERE lower(c.descricao) ILIKE lower(%s)
+        GROUP BY 1,2
+        ORDER BY empresas DESC, codigo_limpo
+        LIMIT %s
+    """
+
+def has_unaccent(db) -> bool:
+    try:
+        res, _ = db.execute_query("SELECT 1 FROM pg_extension WHERE extname = 'unaccent' LIMIT 1")
+        return bool(res)
+    except Exception:
+        return False
+
+def sugerir_cnae(db, termo: str, limit: int = SUGGEST_LIMIT, unaccent: bool = False):
+    if not termo or len(termo.strip()) < 2:
+        return []
+    termo = termo.strip()
+    try:
+        if unaccent:
+            res, _ = db.execute_query(_sql_sugerir_cnae_unaccent(), (f"%{termo}%", limit))
+            return res or []
+    except Exception:
+        pass
+
+    res2, _ = db.execute_query(_sql_sugerir_cnae_fallback(), (f"%{termo}%", limit))
+    return res2 or []
+
+def sugerir_nome_empresa(db, termo: str, limit: int = 12):
+    if not termo or len(termo.strip()) < 2:
+        return []
+    
+    sql = """
+        (
+            SELECT emp.razao_social AS nome, 'Razão Social' AS tipo, COUNT(*) AS qtd
+            FROM empresa emp
+            JOIN estabelecimento est USING (cnpj_basico)
+            WHERE emp.razao_social ILIKE %s
+            GROUP BY emp.razao_social
+        )
+        UNION ALL
+        (
+            SELECT est.nome_fantasia AS nome, 'Nome Fantasia' AS tipo, COUNT(*) AS qtd
+            FROM estabelecimento est
+            WHERE est.nome_fantasia ILIKE %s
+            GROUP BY est.nome_fantasia
+        )
+        ORDER BY qtd DESC, nome
+        LIMIT %s
+    """
+    res, _ = db.execute_query(sql, (f"%{termo.strip()}%", f"%{termo.strip()}%", limit))
+    return res or []
+
+_SQL_DETALHES = """
+    SELECT
+        emp.razao_social,
+        est.nome_fantasia,
+        est.cnpj,
+        est.uf,
+        est.municipio,
+        est.data_inicio_atividade,
+        est.situacao_cadastral,
+        emp.porte_empresa,
+        emp.capital_social,
+        est.logradouro,
+        est.numero,
+        est.bairro,
+        est.cep,
+        est.complemento,
+        est.ddd_1,
+        est.telefone_1,
+        est.correio_eletronico,
+        est.tipo_logradouro,
+        est.cnae_fiscal_principal,
+        cnae.descricao AS descricao_cnae
+    FROM estabelecimento est
+    LEFT JOIN empresa emp ON est.cnpj_basico = emp.cnpj_basico
+    LEFT JOIN cnae cnae
+        ON regexp_replace(cnae.codigo::text, '\\D', '', 'g') = est.cnae_fiscal_principal::text
+"""
+
+def get_detalhes(db, cnpj: str):
+    """(linhas, colunas) do estabelecimento com o CNPJ completo (14 dígitos)."""
+    return db.execute_query(_SQL_DETALHES + "    WHERE est.cnpj = %s\n", (cnpj,))
+
+def get_detalhes_lote(db, cnpjs: list):
+    """Como get_detalhes, para vários CNPJs numa única consulta."""
+    if not cnpjs:
+        return [], []
+    return db.execute_query(_SQL_DETALHES + "    WHERE est.cnpj = ANY(%s)\n", (list(cnpjs),))
+
+_COLUNAS_SELECT = """
+            emp.razao_social,
+            est.nome_fantasia,
+            est.cnpj,
+            est.uf,
+            est.data_inicio_atividade,
+            est.situacao_cadastral,
+            emp.porte_empresa,
+            emp.capital_social,
+            est.municipio,
+            est.cnae_fiscal_principal,
+            cna.descricao AS cnae_descricao"""
+
+_JOIN_CNAE = """
+        LEFT JOIN cnae cna
+          ON regexp_replace(cna.codigo::text, '\\D', '', 'g') = est.cnae_fiscal_principal::text"""
+
+def build_queries(filtros: dict, limit: int = None, offset: int = None, tabela_est: str = "estabelecimento",
+                  podar_por_cidade: bool = False):
+    base_where, params = build_where(filtros, tabela_est, podar_por_cidade=podar_por_cidade)
+
+    sql_count = f"""
+        SELECT COUNT(*)
+        FROM {tabela_est} est
+        LEFT JOIN empresa emp ON est.cnpj_basico = emp.cnpj_basico
+        {base_where}
+    """
+    params_count = list(params)
+
+    sql_select = f"""
+        SELECT{_COLUNAS_SELECT}
+        FROM {tabela_est} est
+        LEFT JOIN empresa emp ON est.cnpj_basico = emp.cnpj_basico{_JOIN_CNAE}
+        {base_where}
+        ORDER BY emp.razao_social NULLS LAST
+        LIMIT %s OFFSET %s
+    """
+    params_select = list(params) + [limit if limit is not None else 100, offset if offset is not None else 0]
+    return (sql_count, params_count), (sql_select, params_select)
+
+# Paginação por chave (keyset): em vez de OFFSET, continua depois da última
+# linha vista (razao_social, cnpj). O custo não cresce com o número da página.
+def build_query_keyset(filtros: dict, limit: int = 100, cursor=None, tabela_est: str = "estabelecimento",
+                       podar_por_cidade: bool = False):
+    base_where, params = build_where(filtros, tabela_est, podar_por_cidade=podar_por_cidade)
+    if cursor is not None:
+        razao, cnpj = cursor
+        if razao is None:
+            base_where += " AND emp.razao_social IS NULL AND est.cnpj > %s"
+            params.append(cnpj)
+        else:
+            base_where += (" AND (emp.razao_social > %s OR (emp.razao_social = %s AND est.cnpj > %s)"
+                           " OR emp.razao_social IS NULL)")
+            params.extend([razao, razao, cnpj])
+
+    sql = f"""
+        SELECT{_COLUNAS_SELECT}
+        FROM {tabela_est} est
+        LEFT JOIN empresa emp ON est.cnpj_basico = emp.cnpj_basico{_JOIN_CNAE}
+        {base_where}
+        ORDER BY emp.razao_social NULLS LAST, est.cnpj
+        LIMIT %s
+    """
+    return sql, params + [limit]
+
+def proximo_cursor(linhas, colunas):
+    """Cursor keyset da última linha de uma página (None se a página veio vazia)."""
+    if not linhas:
+        return None
+    ultima = linhas[-1]
+    return ultima[colunas.index("razao_social")], ultima[colunas.index("cnpj")]
+
+def build_query_export(filtros: dict, tabela_est: str = "estabelecimento", podar_por_cidade: bool = False):
+    """Mesmo SELECT de build_queries, sem LIMIT/OFFSET (para exportação em lotes)."""
+    base_where, params = build_where(filtros, tabela_est, podar_por_cidade=podar_por_cidade)
+    sql = f"""
+        SELECT{_COLUNAS_SELECT}
+        FROM {tabela_est} est
+        LEFT JOIN empresa emp ON est.cnpj_basico = emp.cnpj_basico{_JOIN_CNAE}
+        {base_where}
+        ORDER BY emp.razao_social NULLS LAST, est.cnpj
+    """
+    return sql, params
+
+# Matriz e filiais: todos os estabelecimentos com o mesmo cnpj_basico, por
+# igualdade em idx_est_cnpj_basico. A matriz é a de identificador_matriz_filial
+# = 1 (a ordem do CNPJ nem sempre é 0001); ordenando por (identificador, cnpj)
+# ela vem primeiro, e a paginação continua após o último par.
+FILIAIS_PAGINA = 50
+
+_ORDEM_GRUPO = "COALESCE(est.identificador_matriz_filial::int, 2)"
+
+def get_filiais(db, cnpj_basico: str, limit: int = FILIAIS_PAGINA, apos=None):
+    """(linhas, colunas, total, ativas) de uma página do grupo matriz/filiais.
+
+    apos: (ordem_grupo, cnpj) da última linha da página anterior (ver proximo_cursor_filiais).
+    total e ativas são do grupo inteiro, calculados na mesma consulta (0 se a
+    página vier vazia). linhas é None se a consulta falhar.
+    """
+    ordem, cnpj = apos if apos is not None else (0, "")
+    # As contagens (janela) são feitas sobre o grupo todo, antes do filtro
+    # keyset; o JOIN com cnae fica fora, só para as linhas da página.
+    sql = f"""
+        SELECT
+            est.cnpj,
+            est.tipo,
+            est.ordem_grupo,
+            est.nome_fantasia,
+            est.uf,
+            est.municipio,
+            est.situacao_cadastral,
+            est.cnae_fiscal_principal,
+            cna.descricao AS cnae_descricao,
+            est.total_grupo,
+            est.ativas_grupo
+        FROM (
+            SELECT
+                est.cnpj,
+                CASE WHEN {_ORDEM_GRUPO} = 1 THEN 'Matriz' ELSE 'Filial' END AS tipo,
+                {_ORDEM_GRUPO} AS ordem_grupo,
+                est.nome_fantasia,
+                est.uf,
+                est.municipio,
+                est.situacao_cadastral,
+                est.cnae_fiscal_principal,
+                COUNT(*) OVER () AS total_grupo,
+                COUNT(*) FILTER (WHERE est.situacao_cadastral = 2) OVER () AS ativas_grupo
+            FROM estabelecimento est
+            WHERE est.cnpj_basico = %s
+        ) est{_JOIN_CNAE}
+        WHERE (est.ordem_grupo, est.cnpj) > (%s, %s)
+        ORDER BY est.ordem_grupo, est.cnpj
+        LIMIT %s
+    """
+    linhas, colunas = db.execute_query(sql, (cnpj_basico, int(ordem), cnpj, limit))
+    if linhas is None:
+        return None, None, 0, 0
+    total, ativas = (int(linhas[0][-2]), int(linhas[0][-1])) if linhas else (0, 0)
+    return [linha[:-2] for linha in linhas], colunas[:-2], total, ativas
+
+def proximo_cursor_filiais(linhas, colunas):
+    """(ordem_grupo, cnpj) da última linha de uma página de get_filiais (None se vazia)."""
+    if not linhas:
+        return None
+    ultima = linhas[-1]
+    return ultima[colunas.index("ordem_grupo")], ultima[colunas.index("cnpj")]
+
+# Facetas: contagem exata por valor de cada campo, numa única varredura.
+CAMPOS_FACETA = {
+    "uf": "est.uf",
+    "situacao_cadastral": "est.situacao_cadastral",
+    "cnae_fiscal_principal": "est.cnae_fiscal_principal",
+    "municipio": "est.municipio",
+    "porte_empresa": "emp.porte_empresa",
+}
+
+def build_query_facetas(filtros: dict, campos: list, tabela_est: str = "estabelecimento",
+                        podar_por_cidade: bool = False):
+    invalidos = [c for c in campos if c not in CAMPOS_FACETA]
+    if invalidos or not campos:
+        raise ValueError(f"Campos de faceta inválidos: {invalidos or campos}")
+    base_where, params = build_where(filtros, tabela_est, podar_por_cidade=podar_por_cidade)
+    colunas = [CAMPOS_FACETA[c] for c in campos]
+    grupos = ", ".join(f"({col})" for col in colunas)
+    sql = f"""
+        SELECT {", ".join(f"GROUPING({col})" for col in colunas)}, {", ".join(colunas)}, COUNT(*)
+        FROM {tabela_est} est
+        LEFT JOIN empresa emp ON est.cnpj_basico = emp.cnpj_basico
+        {base_where}
+        GROUP BY GROUPING SETS ({grupos})
+    """
+    return sql, params
+
+def resumir_facetas(linhas, campos: list):
+    """{campo: [(valor, qtd), ...]} em ordem decrescente de qtd."""
+    n = len(campos)
+    facetas = {c: [] for c in campos}
+    for linha in linhas or []:
+        agrupado, valores, qtd = linha[:n], linha[n:2 * n], linha[-1]
+        # o campo da linha é o único que não está agregado (GROUPING = 0)
+        i = list(agrupado).index(0)
+        facetas[campos[i]].append((valores[i], qtd))
+    for c in campos:
+        facetas[c].sort(key=lambda item: item[1], reverse=True)
+    return facetas
+
+# Exploração rápida: mesmo WHERE de build_where, mas sobre estabelecimento_amostra,
+# uma amostra Bernoulli (linha a linha) de estabelecimento já juntada com as
+# colunas de empresa (ver schema.py --amostra). Os totais são extrapolados pela
+# fração. Sem o JOIN com empresa, a consulta lê só as linhas da amostra.
+AMOSTRA_TABELA = "estabelecimento_amostra"
+AMOSTRA_PERCENTUAL = 0.5
+AMOSTRA_SEMENTE = 42
+AMOSTRA_PAGINA = 20
+
+# colunas de empresa copiadas para a amostra
+AMOSTRA_COLUNAS_EMPRESA = ["razao_social", "porte_empresa", "capital_social"]
+
+def build_queries_amostra(filtros: dict, limit: int = AMOSTRA_PAGINA, tabela_amostra: str = AMOSTRA_TABELA):
+    # sem podar_por_cidade: a amostra não é particionada e a UF derivada da
+    # cidade exigiria consultar estabelecimento inteira
+    base_where, params = build_where(filtros, alias_emp="est")
+
+    # Total, por UF e por situação numa única varredura da amostra.
+    sql_dist = f"""
+        SELECT GROUPING(est.uf) AS g_uf, GROUPING(est.situacao_cadastral) AS g_sit,
+               est.uf, est.situacao_cadastral, COUNT(*)
+        FROM {tabela_amostra} est
+        {base_where}
+        GROUP BY GROUPING SETS ((), (est.uf), (est.situacao_cadastral))
+    """
+    params_dist = list(params)
+
+    sql_pagina = f"""
+        SELECT{_COLUNAS_SELECT.replace("emp.", "est.")}
+        FROM {tabela_amostra} est{_JOIN_CNAE}
+        {base_where}
+        LIMIT %s
+    """
+    params_pagina = list(params) + [limit]
+    return (sql_dist, params_dist), (sql_pagina, params_pagina)
+
+def estimar_total(n_amostra: int, percentual: float = AMOSTRA_PERCENTUAL, z: float = 1.96):
+    """(estimativa, mínimo, máximo) com IC de ~95% para um total extrapolado da amostra.
+
+    A amostra é Bernoulli com fração f (cada linha entra independentemente), então
+    a contagem da amostra é binomial(N, f).
+    """
+    f = percentual / 100.0
+    if n_amostra == 0:
+        # regra do três: nenhum caso na amostra
+        return 0, 0, int(round(3 / f))
+    estimativa = n_amostra / f
+    erro = z * (n_amostra * (1 - f)) ** 0.5 / f
+    return int(round(estimativa)), int(max(0, round(estimativa - erro))), int(round(estimativa + erro))
+
+def resumir_amostra(linhas_dist, percentual: float = AMOSTRA_PERCENTUAL):
+    """Separa o resultado de sql_dist em total, por UF e por situação (já extrapolados)."""
+    total = estimar_total(0, percentual)
+    por_uf, por_situacao = {}, {}
+    for g_uf, g_sit, uf, situacao, qtd in linhas_dist or []:
+        if g_uf and g_sit:
+            total = estimar_total(qtd, percentual)
+        elif not g_uf:
+            por_uf[uf] = estimar_total(qtd, percentual)
+        else:
+            por_situacao[situacao] = estimar_total(qtd, percentual)
+    return total, por_uf, por_situacao
@@ -1,4 +1,6 @@
+import threading
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from config import DB_CONFIG
 
 class Database:
@@ -12,6 +14,9 @@ class Database:
         except Exception as e:
             print(f"Erro ao conectar: {e}")
             return None
+
+    def release(self, conn):
+        conn.close()
             
     def execute_query(self, query, params=None):
         conn = self.connect()
@@ -19,20 +24,71 @@ class Database:
             try:
                 with conn.cursor() as cursor:
                     cursor.execute(query, params)
-                    if query.strip().lower().startswith('select'):
+                    result, columns = None, None
+                    if cursor.description is not None:
                         result = cursor.fetchall()
                         columns = [desc[0] for desc in cursor.description]
-                        return result, columns
+                    # também quando há linhas: INSERT ... RETURNING, CTE que escreve
                     conn.commit()
-                    return None, None
+                    return result, columns
             except Exception as e:
                 print(f"Erro na query: {e}")
                 return None, None
             finally:
-                conn.close()
+                self.release(conn)
         return None, None
+
+    def iter_query(self, query, params=None, lote=5000):
+        """Gera (colunas, linhas) em lotes, via cursor no servidor (não carrega tudo na memória)."""
+        conn = self.connect()
+        if conn is None:
+            raise RuntimeError("Não foi possível conectar ao banco")
+        try:
+            with conn.cursor(name="iter_query") as cursor:
+                cursor.itersize = lote
+                cursor.execute(query, params)
+                while True:
+                    linhas = cursor.fetchmany(lote)
+                    if not linhas:
+                        break
+                    yield [desc[0] for desc in cursor.description], linhas
+        finally:
+            self.release(conn)
     
     def get_unique_values(self, column_name, table_name):
         query = f"SELECT DISTINCT {column_name} FROM {table_name} ORDER BY {column_name}"
         result, _ = self.execute_query(query)
-        return [item[0] for item in result] if result else []
\ No newline at end of file
+        return [item[0] for item in result] if result else []
+
+class PooledDatabase(Database):
+    """Database com pool de conexões compartilhado entre threads.
+
+    connect() bloqueia quando todas as maxconn conexões estão em uso, em vez de
+    falhar como o ThreadedConnectionPool puro.
+    """
+    def __init__(self, minconn=1, maxconn=10):
+        super().__init__()
+        self.pool = ThreadedConnectionPool(minconn, maxconn, **DB_CONFIG)
+        self.vagas = threading.BoundedSemaphore(maxconn)
+
+    def connect(self):
+        self.vagas.acquire()
+        try:
+            return self.pool.getconn()
+        except Exception as e:
+            self.vagas.release()
+            print(f"Erro ao conectar: {e}")
+            return None
+
+    def release(self, conn):
+        try:
+            if not conn.closed:
+                # iter_query e consultas que falharam não fazem commit; não
+                # devolver conexão "idle in transaction"
+                conn.rollback()
+            self.pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self.vagas.release()
+
+    def close(self):
+        self.pool.closeall()
\ No newline at end of file
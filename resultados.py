@@ -0,0 +1,78 @@
+"""Montagem de DataFrames compactos a partir de lotes do cursor.
+
+pd.DataFrame(fetchall(), columns=...) mantém vivas, ao mesmo tempo, a lista de
+tuplas e colunas object. Aqui cada lote (colunas, linhas) de Database.iter_query
+ou ClienteConsultas.exportar é copiado coluna a coluna já no tipo final e
+descartado em seguida.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+TIPOS_PADRAO = {
+    "uf": "category",
+    "municipio": "category",
+    "cnae_fiscal_principal": "category",
+    "cnae_descricao": "category",
+    "descricao_cnae": "category",
+    # código de 2 dígitos ("01", "03", "05"): category ocupa 1 byte por linha e
+    # preserva o texto usado por traduzir_porte e no CSV
+    "porte_empresa": "category",
+    "situacao_cadastral": "Int8",
+    "capital_social": "float64",
+    "data_inicio_atividade": "datetime64[ns]",
+}
+
+def _converter(valores, tipo):
+    if tipo == "category":
+        return pd.Categorical(valores)
+    if tipo == "float64":
+        return np.fromiter((np.nan if v is None else float(v) for v in valores), dtype="float64", count=len(valores))
+    if tipo == "datetime64[ns]":
+        return pd.to_datetime(pd.Series(valores, dtype=object), errors="coerce").to_numpy(dtype="datetime64[ns]")
+    if tipo in ("Int8", "Int16", "Int32", "Int64"):
+        # nulos viram <NA>
+        return pd.array(pd.to_numeric(pd.Series(valores, dtype=object), errors="coerce"), dtype=tipo)
+    arr = np.empty(len(valores), dtype=object)
+    arr[:] = valores
+    return arr
+
+def _juntar(partes):
+    if isinstance(partes[0], pd.Categorical):
+        # um lote só de nulos tem categorias vazias de outro dtype, que
+        # union_categoricals recusa; alinha ao dtype dos lotes com valores
+        ref = next((p.categories.dtype for p in partes if len(p.categories)), None)
+        if ref is not None:
+            partes = [p if len(p.categories) else p.set_categories(p.categories.astype(ref)) for p in partes]
+        return union_categoricals(partes)
+    if isinstance(partes[0], np.ndarray):
+        return np.concatenate(partes)
+    return pd.concat([pd.Series(p, copy=False) for p in partes], ignore_index=True).array
+
+def montar_dataframe(lotes, tipos: dict = None) -> pd.DataFrame:
+    """DataFrame a partir de um iterável de (colunas, linhas).
+
+    tipos: {coluna: dtype}; por padrão TIPOS_PADRAO. Colunas sem tipo ficam object.
+    """
+    tipos = TIPOS_PADRAO if tipos is None else tipos
+    colunas, partes, vistas = None, None, []
+    for colunas_lote, linhas in lotes:
+        vistas = colunas_lote
+        if not linhas:
+            continue
+        if colunas is None:
+            colunas = list(colunas_lote)
+            partes = {c: [] for c in colunas}
+        for coluna, valores in zip(colunas, zip(*linhas)):
+            partes[coluna].append(_converter(valores, tipos.get(coluna)))
+        del linhas  # o lote de tuplas não é mais necessário
+
+    if colunas is None:
+        return pd.DataFrame(columns=list(vistas))
+    dados = {}
+    for coluna in colunas:
+        dados[coluna] = _juntar(partes.pop(coluna))
+    return pd.DataFrame(dados, copy=False)
+
+def bytes_por_linha(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / max(1, len(df))
@@ -0,0 +1,192 @@
+"""(Re)construção de estabelecimento particionada por UF.
+
+Uso:
+    python schema.py                      # cria e popula estabelecimento_part
+    python schema.py --por-situacao       # idem, subparticionando cada UF em Ativa / demais
+    python schema.py --trocar             # depois de criar, troca estabelecimento pela particionada
+    python schema.py --amostra            # (re)cria estabelecimento_amostra (exploração rápida)
+    python schema.py --dry-run ...        # só imprime o SQL
+
+A tabela original é mantida como estabelecimento_heap após a troca, para
+comparar com bench_particionamento.py e voltar atrás se necessário. Se ela já
+existir (troca anterior), a troca é recusada; use --descartar-antiga para
+apagá-la explicitamente.
+"""
+import argparse
+from database import Database
+from consultas import AMOSTRA_TABELA, AMOSTRA_PERCENTUAL, AMOSTRA_SEMENTE, AMOSTRA_COLUNAS_EMPRESA
+
+TABELA = "estabelecimento"
+DESTINO_PADRAO = "estabelecimento_part"
+ANTIGA_PADRAO = "estabelecimento_heap"
+
+UFS = [
+    "AC", "AL", "AM", "AP", "BA", "CE", "DF", "ES", "GO", "MA", "MG", "MS", "MT", "PA",
+    "PB", "PE", "PI", "PR", "RJ", "RN", "RO", "RR", "RS", "SC", "SE", "SP", "TO", "EX",
+]
+
+SITUACAO_ATIVA = 2
+
+# Com o particionamento, idx_est_uf e idx_est_situacao deixam de ser necessários:
+# o filtro por UF / situação vira poda de partição.
+INDICES = [
+    "USING gin ( (cnpj::text) gin_trgm_ops )",
+    "USING gin ( (nome_fantasia::text) gin_trgm_ops )",
+    "(cnpj)",
+    "(cnpj_basico)",
+    "(cnae_fiscal_principal)",
+    "(municipio)",
+]
+
+def sql_criar(destino: str = DESTINO_PADRAO, por_situacao: bool = False) -> list:
+    cmds = [
+        f"DROP TABLE IF EXISTS {destino} CASCADE",
+        f"CREATE TABLE {destino} (LIKE {TABELA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY LIST (uf)",
+    ]
+    for uf in UFS:
+        particao = f"{destino}_{uf.lower()}"
+        if por_situacao:
+            cmds.append(f"CREATE TABLE {particao} PARTITION OF {destino} FOR VALUES IN ('{uf}') "
+                        f"PARTITION BY LIST (situacao_cadastral)")
+            cmds.append(f"CREATE TABLE {particao}_ativa PARTITION OF {particao} FOR VALUES IN ('{SITUACAO_ATIVA}')")
+            cmds.append(f"CREATE TABLE {particao}_demais PARTITION OF {particao} DEFAULT")
+        else:
+            cmds.append(f"CREATE TABLE {particao} PARTITION OF {destino} FOR VALUES IN ('{uf}')")
+    # UF nula ou fora da lista
+    cmds.append(f"CREATE TABLE {destino}_outras PARTITION OF {destino} DEFAULT")
+    return cmds
+
+def sql_popular(destino: str = DESTINO_PADRAO) -> list:
+    return [f"INSERT INTO {destino} SELECT * FROM {TABELA}"]
+
+def sql_indices(destino: str = DESTINO_PADRAO) -> list:
+    # Índice no pai particionado é propagado para todas as partições.
+    # Sem nome explícito para não colidir com os idx_est_* da tabela atual.
+    cmds = [f"CREATE INDEX ON {destino} {definicao}" for definicao in INDICES]
+    # mesmas estatísticas que o README configura na tabela única
+    for coluna in ("cnae_fiscal_principal", "uf", "situacao_cadastral"):
+        cmds.append(f"ALTER TABLE {destino} ALTER COLUMN {coluna} SET STATISTICS 1000")
+    cmds.append(f"CREATE STATISTICS IF NOT EXISTS stx_{destino}_uf_cnae (ndistinct) "
+                f"ON uf, cnae_fiscal_principal FROM {destino}")
+    return cmds
+
+def sql_analisar(destino: str = DESTINO_PADRAO) -> list:
+    return [f"ANALYZE {destino}"]
+
+def _sql_renomear_particoes(tabela: str, prefixo_antigo: str, prefixo_novo: str) -> str:
+    return f"""
+        DO $$
+        DECLARE r record;
+        BEGIN
+            FOR r IN
+                SELECT c.relname
+                FROM pg_partition_tree('{tabela}') p
+                JOIN pg_class c ON c.oid = p.relid
+                WHERE p.level > 0 AND c.relname LIKE '{prefixo_antigo}\\_%'
+            LOOP
+                EXECUTE format('ALTER TABLE %I RENAME TO %I', r.relname,
+                               '{prefixo_novo}' || substr(r.relname, {len(prefixo_antigo) + 1}));
+            END LOOP;
+        END $$
+    """
+
+def _sql_exigir_ausente(tabela: str) -> str:
+    return f"""
+        DO $$
+        BEGIN
+            IF to_regclass('{tabela}') IS NOT NULL THEN
+                RAISE EXCEPTION '{tabela} já existe (troca anterior?); use --descartar-antiga para apagá-la';
+            END IF;
+        END $$
+    """
+
+def sql_trocar(destino: str = DESTINO_PADRAO, antiga: str = ANTIGA_PADRAO, descartar_antiga: bool = False) -> list:
+    # Um único comando => uma única transação: a app nunca vê a tabela ausente.
+    return [";\n".join([
+        f"DROP TABLE IF EXISTS {antiga} CASCADE" if descartar_antiga else _sql_exigir_ausente(antiga),
+        f"ALTER TABLE {TABELA} RENAME TO {antiga}",
+        _sql_renomear_particoes(antiga, TABELA, antiga),
+        f"ALTER TABLE {destino} RENAME TO {TABELA}",
+        _sql_renomear_particoes(TABELA, destino, TABELA),
+    ])]
+
+def sql_amostra(tabela: str = AMOSTRA_TABELA, percentual: float = AMOSTRA_PERCENTUAL) -> list:
+    # BERNOULLI sorteia linha a linha (lê a tabela inteira uma vez, aqui e não a
+    # cada consulta), o que mantém válido o intervalo de consultas.estimar_total.
+    nova = f"{tabela}_nova"
+    colunas_emp = ", ".join(f"emp.{c}" for c in AMOSTRA_COLUNAS_EMPRESA)
+    return [
+        f"DROP TABLE IF EXISTS {nova}",
+        f"""CREATE TABLE {nova} AS
+            SELECT est.*, {colunas_emp}
+            FROM {TABELA} est TABLESAMPLE BERNOULLI ({float(percentual)}) REPEATABLE ({AMOSTRA_SEMENTE})
+            LEFT JOIN empresa emp ON est.cnpj_basico = emp.cnpj_basico""",
+        f"ANALYZE {nova}",
+        # troca numa única transação, como em sql_trocar
+        ";\n".join([f"DROP TABLE IF EXISTS {tabela}", f"ALTER TABLE {nova} RENAME TO {tabela}"]),
+    ]
+
+def plano(destino: str = DESTINO_PADRAO, por_situacao: bool = False, trocar: bool = False,
+          antiga: str = ANTIGA_PADRAO, descartar_antiga: bool = False) -> list:
+    cmds = sql_criar(destino, por_situacao) + sql_popular(destino) + sql_indices(destino) + sql_analisar(destino)
+    if trocar:
+        cmds += sql_trocar(destino, antiga, descartar_antiga)
+    return cmds
+
+def tabela_existe(tabela: str, db: Database = None) -> bool:
+    db = db or Database()
+    res, _ = db.execute_query("SELECT to_regclass(%s) IS NOT NULL", (tabela,))
+    if res is None:
+        raise RuntimeError("Não foi possível consultar o banco")
+    return bool(res[0][0])
+
+def executar(cmds: list, db: Database = None):
+    db = db or Database()
+    conn = db.connect()
+    if conn is None:
+        raise RuntimeError("Não foi possível conectar ao banco")
+    try:
+        for cmd in cmds:
+            print(cmd.strip().splitlines()[0][:100])
+            with conn.cursor() as cursor:
+                cursor.execute(cmd)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói estabelecimento particionada por UF")
+    parser.add_argument("--destino", default=DESTINO_PADRAO)
+    parser.add_argument("--por-situacao", action="store_true", help="subparticiona cada UF em Ativa / demais")
+    parser.add_argument("--trocar", action="store_true", help=f"renomeia a particionada para {TABELA} ao final")
+    parser.add_argument("--somente-trocar", action="store_true", help="só faz a troca (destino já populado)")
+    parser.add_argument("--antiga", default=ANTIGA_PADRAO, help="nome da tabela original após a troca")
+    parser.add_argument("--descartar-antiga", action="store_true",
+                        help="apaga --antiga se ela já existir (senão a troca é recusada)")
+    parser.add_argument("--amostra", action="store_true",
+                        help=f"só (re)cria {AMOSTRA_TABELA}, a amostra da exploração rápida")
+    parser.add_argument("--dry-run", action="store_true", help="só imprime o SQL")
+    args = parser.parse_args()
+
+    if args.amostra:
+        cmds = sql_amostra()
+    elif args.somente_trocar:
+        cmds = sql_trocar(args.destino, args.antiga, args.descartar_antiga)
+    else:
+        cmds = plano(args.destino, args.por_situacao, args.trocar, args.antiga, args.descartar_antiga)
+
+    if args.dry_run:
+        for cmd in cmds:
+            print(cmd.strip() + ";\n")
+        return
+    # falha antes de reconstruir (o que leva horas) em vez de só na troca
+    if (args.trocar or args.somente_trocar) and not args.amostra and not args.descartar_antiga \
+            and tabela_existe(args.antiga):
+        parser.error(f"{args.antiga} já existe (troca anterior?); use --descartar-antiga para apagá-la")
+    executar(cmds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""Serviço HTTP/JSON local sobre consultas.py, sem Streamlit.
+
+Uso:
+    python servico.py [--host 127.0.0.1] [--porta 8765] [--conexoes 10]
+
+Todas as consultas passam por um pool de conexões e por um cache compartilhado
+entre os clientes. Filtros seguem o mesmo formato de st.session_state.filtros
+na app; campos omitidos assumem consultas.FILTROS_PADRAO.
+
+    GET  /saude
+    GET  /ufs | /portes | /capital
+    GET  /cidades?uf=SP
+    GET  /cnae/infos?codigos=5611201,4711302
+    GET  /sugestoes/cnae?termo=sorvete&limit=20
+    GET  /sugestoes/nome?termo=padaria&limit=12
+    GET  /filiais?cnpj_basico=12345678&cursor=...&limit=50
+                                                   matriz e filiais do grupo, paginado
+    GET  /cache                                    estatísticas do cache
+    POST /contagem  {"filtros": {...}}             -> {"total": n}
+    POST /facetas   {"filtros": {...}, "campos": ["uf", "situacao_cadastral"]}
+    POST /amostra   {"filtros": {...}}             -> exploração rápida (estimativas)
+    POST /pagina    {"filtros": {...}, "limit": 100, "cursor": null}      (NDJSON)
+    POST /detalhes  {"cnpjs": ["...", ...]}                               (NDJSON)
+    POST /exportar  {"filtros": {...}}                                    (NDJSON)
+
+Respostas NDJSON: uma linha {"colunas": [...]}, uma linha por registro (lista
+na ordem das colunas) e, em /pagina, uma última linha {"cursor": ...} para
+pedir a página seguinte (null quando acabou).
+"""
+import argparse
+import base64
+import datetime
+import decimal
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from config import SERVICO_HOST, SERVICO_PORTA, ESTABELECIMENTO_PARTICIONADA
+from database import PooledDatabase
+from cache import CacheTTL
+import consultas
+from consultas import ErroConsulta
+
+LIMITE_PAGINA_MAX = 1000
+LIMITE_DETALHES_MAX = 1000
+LIMITE_FILIAIS_MAX = 1000
+
+TTL_CACHE = {
+    "ufs": None, "cidades": None, "portes": None, "capital": None, "unaccent": None,
+    "cnae_infos": 600, "sugestoes_cnae": 600, "sugestoes_nome": 600,
+    "contagem": 300, "facetas": 300, "amostra": 300,
+    "filiais": 600,
+}
+
+class ErroRequisicao(ValueError):
+    pass
+
+def _json_padrao(valor):
+    if isinstance(valor, decimal.Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+def _dumps(obj):
+    return json.dumps(obj, default=_json_padrao, ensure_ascii=False)
+
+def codificar_cursor(cursor):
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(_dumps(list(cursor)).encode()).decode()
+
+def decodificar_cursor(texto):
+    if not texto:
+        return None
+    try:
+        # (razao_social, cnpj) em /pagina, (ordem_grupo, cnpj) em /filiais
+        chave, cnpj = json.loads(base64.urlsafe_b64decode(texto.encode()))
+        return chave, cnpj
+    except Exception:
+        raise ErroRequisicao("cursor inválido")
+
+def _chave(obj):
+    return json.dumps(obj, sort_keys=True, default=_json_padrao)
+
+class ServicoConsultas:
+    def __init__(self, conexoes: int = 10):
+        self.db = PooledDatabase(maxconn=conexoes)
+        self.cache = CacheTTL(TTL_CACHE, agrupar_faltas=True, max_itens=10000)
+
+    def _filtros(self, corpo):
+        filtros = dict(consultas.FILTROS_PADRAO, **(corpo.get("filtros") or {}))
+        if filtros["situacao"] != "Todos" and filtros["situacao"] not in consultas.SITUACAO_MAP:
+            raise ErroRequisicao(f"situacao inválida: {filtros['situacao']}")
+        return filtros
+
+    def _executar(self, sql, params):
+        linhas, colunas = self.db.execute_query(sql, params)
+        if linhas is None:
+            raise ErroConsulta("erro ao executar a consulta")
+        return linhas, colunas
+
+    # --- GET ---
+
+    def ufs(self, q):
+        return self.cache.chamar("ufs", lambda: consultas.get_ufs(self.db))
+
+    def cidades(self, q):
+        uf = q.get("uf")
+        return self.cache.chamar("cidades", lambda u: consultas.get_cidades(self.db, u), uf)
+
+    def portes(self, q):
+        return self.cache.chamar("portes", lambda: consultas.get_portes(self.db))
+
+    def capital(self, q):
+        return self.cache.chamar("capital", lambda: consultas.get_capital_range(self.db))
+
+    def cnae_infos(self, q):
+        codigos = tuple(c for c in (q.get("codigos") or "").split(",") if c)
+        return self.cache.chamar("cnae_infos", lambda cods: consultas.get_cnae_infos(self.db, list(cods)), codigos)
+
+    def sugestoes_cnae(self, q):
+        limit = int(q.get("limit", consultas.SUGGEST_LIMIT))
+        unaccent = self.cache.chamar("unaccent", lambda: consultas.has_unaccent(self.db))
+        return self.cache.chamar("sugestoes_cnae",
+                                 lambda t, n: consultas.sugerir_cnae(self.db, t, n, unaccent=unaccent),
+                                 (q.get("termo") or "").strip(), limit)
+
+    def sugestoes_nome(self, q):
+        limit = int(q.get("limit", 12))
+        return self.cache.chamar("sugestoes_nome", lambda t, n: consultas.sugerir_nome_empresa(self.db, t, n),
+                                 (q.get("termo") or "").strip(), limit)
+
+    def filiais(self, q):
+        # aceita o CNPJ completo ou só a raiz; o grupo é definido pelos 8 primeiros dígitos
+        cnpj_basico = "".join(ch for ch in q.get("cnpj_basico", "") if ch.isdigit())[:8]
+        if len(cnpj_basico) != 8:
+            raise ErroRequisicao("cnpj_basico deve ter 8 dígitos")
+        limit = int(q.get("limit", consultas.FILIAIS_PAGINA))
+        if not 1 <= limit <= LIMITE_FILIAIS_MAX:
+            raise ErroRequisicao(f"limit deve estar entre 1 e {LIMITE_FILIAIS_MAX}")
+        apos = decodificar_cursor(q.get("cursor"))
+
+        def pagina(basico, cursor, n):
+            linhas, colunas, total, ativas = consultas.get_filiais(self.db, basico, n, cursor)
+            if linhas is None:
+                raise ErroConsulta("erro ao buscar filiais")
+            return linhas, colunas, total, ativas
+
+        linhas, colunas, total, ativas = self.cache.chamar("filiais", pagina, cnpj_basico, apos, limit)
+        proximo = codificar_cursor(consultas.proximo_cursor_filiais(linhas, colunas)) if len(linhas) == limit else None
+        return {"total": total, "ativas": ativas, "colunas": colunas, "linhas": linhas, "cursor": proximo}
+
+    def estatisticas_cache(self, q):
+        return self.cache.estatisticas()
+
+    # --- POST (JSON) ---
+
+    def contagem(self, corpo):
+        filtros = self._filtros(corpo)
+
+        def contar(_):
+            (sql_count, params_count), _ = consultas.build_queries(filtros, podar_por_cidade=ESTABELECIMENTO_PARTICIONADA)
+            linhas, _ = self._executar(sql_count, params_count)
+            return int(linhas[0][0]) if linhas else 0
+
+        return {"total": self.cache.chamar("contagem", contar, _chave(filtros))}
+
+    def facetas(self, corpo):
+        filtros = self._filtros(corpo)
+        campos = list(corpo.get("campos") or ["uf", "situacao_cadastral"])
+        try:
+            sql, params = consultas.build_query_facetas(filtros, campos, podar_por_cidade=ESTABELECIMENTO_PARTICIONADA)
+        except ValueError as e:
+            raise ErroRequisicao(str(e))
+
+        def calcular(_):
+            linhas, _ = self._executar(sql, params)
+            return consultas.resumir_facetas(linhas, campos)
+
+        return self.cache.chamar("facetas", calcular, _chave([filtros, campos]))
+
+    def amostra(self, corpo):
+        filtros = self._filtros(corpo)
+
+        def calcular(_):
+            (sql_dist, params_dist), (sql_pag, params_pag) = consultas.build_queries_amostra(filtros)
+            try:
+                linhas_dist, _ = self._executar(sql_dist, params_dist)
+                linhas_pag, colunas_pag = self._executar(sql_pag, params_pag)
+            except ErroConsulta:
+                raise ErroConsulta(f"erro ao consultar {consultas.AMOSTRA_TABELA} "
+                                   "(ela existe? crie com: python schema.py --amostra)")
+            total, por_uf, por_situacao = consultas.resumir_amostra(linhas_dist)
+            return {
+                "percentual": consultas.AMOSTRA_PERCENTUAL,
+                "total": total,
+                # listas, não dicts: JSON transformaria as chaves numéricas em texto
+                "por_uf": [[uf, *est] for uf, est in por_uf.items()],
+                "por_situacao": [[sit, *est] for sit, est in por_situacao.items()],
+                "pagina": {"colunas": colunas_pag, "linhas": linhas_pag},
+            }
+
+        return self.cache.chamar("amostra", calcular, _chave(filtros))
+
+    # --- POST (NDJSON) ---
+
+    def pagina(self, corpo):
+        filtros = self._filtros(corpo)
+        limit = int(corpo.get("limit") or filtros["limit"])
+        if not 1 <= limit <= LIMITE_PAGINA_MAX:
+            raise ErroRequisicao(f"limit deve estar entre 1 e {LIMITE_PAGINA_MAX}")
+        cursor = decodificar_cursor(corpo.get("cursor"))
+        sql, params = consultas.build_query_keyset(filtros, limit, cursor,
+                                              podar_por_cidade=ESTABELECIMENTO_PARTICIONADA)
+        linhas, colunas = self._executar(sql, params)
+
+        def gerar():
+            yield {"colunas": colunas}
+            yield from linhas
+            fim = len(linhas) < limit
+            yield {"cursor": None if fim else codificar_cursor(consultas.proximo_cursor(linhas, colunas))}
+
+        return gerar()
+
+    def detalhes(self, corpo):
+        cnpjs = ["".join(ch for ch in str(c) if ch.isdigit()) for c in corpo.get("cnpjs") or []]
+        if len(cnpjs) > LIMITE_DETALHES_MAX:
+            raise ErroRequisicao(f"no máximo {LIMITE_DETALHES_MAX} CNPJs por requisição")
+        linhas, colunas = consultas.get_detalhes_lote(self.db, cnpjs)
+        if linhas is None:
+            raise ErroConsulta("erro ao buscar detalhes")
+
+        def gerar():
+            yield {"colunas": colunas}
+            yield from linhas
+
+        return gerar()
+
+    def exportar(self, corpo):
+        filtros = self._filtros(corpo)
+        sql, params = consultas.build_query_export(filtros, podar_por_cidade=ESTABELECIMENTO_PARTICIONADA)
+
+        def gerar():
+            cabecalho = False
+            for colunas, lote in self.db.iter_query(sql, params):
+                if not cabecalho:
+                    yield {"colunas": colunas}
+                    cabecalho = True
+                yield from lote
+            if not cabecalho:
+                yield {"colunas": []}
+
+        return gerar()
+
+ROTAS_GET = {
+    "/ufs": "ufs", "/cidades": "cidades", "/portes": "portes", "/capital": "capital",
+    "/cnae/infos": "cnae_infos", "/sugestoes/cnae": "sugestoes_cnae", "/sugestoes/nome": "sugestoes_nome",
+    "/filiais": "filiais",
+    "/cache": "estatisticas_cache",
+}
+ROTAS_POST = {"/contagem": "contagem", "/facetas": "facetas", "/amostra": "amostra"}
+ROTAS_NDJSON = {"/pagina": "pagina", "/detalhes": "detalhes", "/exportar": "exportar"}
+
+class Handler(BaseHTTPRequestHandler):
+    servico = None  # ServicoConsultas, definido em main()
+
+    def _responder(self, status, obj):
+        corpo = _dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _transmitir(self, linhas):
+        # HTTP/1.0 sem Content-Length: o fim da resposta é o fechamento da conexão
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        try:
+            for item in linhas:
+                self.wfile.write(_dumps(item).encode() + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            self.wfile.write(_dumps({"erro": str(e)}).encode() + b"\n")
+
+    def _tratar(self, func):
+        try:
+            func()
+        except ErroRequisicao as e:
+            self._responder(400, {"erro": str(e)})
+        except (KeyError, TypeError, ValueError) as e:
+            self._responder(400, {"erro": f"requisição inválida: {e}"})
+        except Exception as e:
+            self._responder(500, {"erro": str(e)})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/saude":
+            return self._responder(200, {"ok": True})
+        metodo = ROTAS_GET.get(url.path)
+        if metodo is None:
+            return self._responder(404, {"erro": "rota desconhecida"})
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self._tratar(lambda: self._responder(200, getattr(self.servico, metodo)(q)))
+
+    def do_POST(self):
+        caminho = urlparse(self.path).path
+        metodo = ROTAS_POST.get(caminho) or ROTAS_NDJSON.get(caminho)
+        if metodo is None:
+            return self._responder(404, {"erro": "rota desconhecida"})
+
+        def atender():
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+            if not isinstance(corpo, dict):
+                raise ErroRequisicao("o corpo da requisição deve ser um objeto JSON")
+            resultado = getattr(self.servico, metodo)(corpo)
+            if caminho in ROTAS_NDJSON:
+                self._transmitir(resultado)
+            else:
+                self._responder(200, resultado)
+
+        self._tratar(atender)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP de consultas")
+    parser.add_argument("--host", default=SERVICO_HOST)
+    parser.add_argument("--porta", type=int, default=SERVICO_PORTA)
+    parser.add_argument("--conexoes", type=int, default=10, help="tamanho máximo do pool de conexões")
+    args = parser.parse_args()
+
+    Handler.servico = ServicoConsultas(args.conexoes)
+    servidor = ThreadingHTTPServer((args.host, args.porta), Handler)
+    servidor.daemon_threads = True
+    print(f"Serviço de consultas em http://{args.host}:{args.porta}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        Handler.servico.db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import threading
+import time
+
+from cache import CacheTTL
+
+def _chamadas_concorrentes(cache, n=8):
+    chamadas = []
+    inicio = threading.Barrier(n)
+
+    def lento(x):
+        chamadas.append(x)
+        time.sleep(0.1)
+        return x * 2
+
+    resultados = []
+
+    def cliente():
+        inicio.wait()
+        resultados.append(cache.chamar("f", lento, 21))
+
+    threads = [threading.Thread(target=cliente) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return chamadas, resultados
+
+def test_agrupar_faltas_calcula_uma_vez():
+    cache = CacheTTL({"f": None}, agrupar_faltas=True)
+    chamadas, resultados = _chamadas_concorrentes(cache)
+    assert chamadas == [21]
+    assert resultados == [42] * 8
+    e = cache.estatisticas()["f"]
+    assert e["faltas"] == 1 and e["acertos"] == 7 and e["stampedes"] == 0
+
+def test_sem_agrupar_conta_stampede():
+    cache = CacheTTL({"f": None})
+    chamadas, resultados = _chamadas_concorrentes(cache)
+    assert len(chamadas) > 1
+    assert resultados == [42] * 8
+    e = cache.estatisticas()["f"]
+    assert e["stampedes"] == len(chamadas) - 1
+
+def test_erro_nao_prende_quem_espera():
+    cache = CacheTTL({"f": None}, agrupar_faltas=True)
+
+    def falha():
+        raise RuntimeError("banco fora")
+
+    try:
+        cache.chamar("f", falha)
+    except RuntimeError:
+        pass
+    assert cache.chamar("f", lambda: 1) == 1
+
+def test_ttl_expira():
+    cache = CacheTTL({"f": 0.05})
+    assert cache.chamar("f", lambda: 1) == 1
+    assert cache.chamar("f", lambda: 2) == 1
+    time.sleep(0.06)
+    assert cache.chamar("f", lambda: 3) == 3
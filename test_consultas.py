@@ -0,0 +1,74 @@
+import pytest
+
+import consultas
+from consultas import FILTROS_PADRAO, build_query_keyset, proximo_cursor
+
+def _filtros(**extra):
+    return dict(FILTROS_PADRAO, **extra)
+
+def _placeholders(sql):
+    return sql.count("%s")
+
+def test_keyset_primeira_pagina_sem_predicado_de_cursor():
+    sql, params = build_query_keyset(_filtros(uf="SP"), limit=50)
+    assert "emp.razao_social >" not in sql
+    assert "ORDER BY emp.razao_social NULLS LAST, est.cnpj" in sql
+    assert params == ["SP", 0, 500000, 50]
+    assert _placeholders(sql) == len(params)
+
+def test_keyset_cursor_com_razao_social():
+    sql, params = build_query_keyset(_filtros(), limit=10, cursor=("ACME LTDA", "00000000000191"))
+    # depois da razão social, ou mesma razão e CNPJ maior, ou já nas razões nulas (NULLS LAST)
+    assert ("(emp.razao_social > %s OR (emp.razao_social = %s AND est.cnpj > %s)"
+            " OR emp.razao_social IS NULL)") in sql
+    assert params == [0, 500000, "ACME LTDA", "ACME LTDA", "00000000000191", 10]
+    assert _placeholders(sql) == len(params)
+
+def test_keyset_cursor_com_razao_social_nula():
+    sql, params = build_query_keyset(_filtros(), limit=10, cursor=(None, "00000000000191"))
+    # entre as razões nulas só resta avançar pelo CNPJ
+    assert "emp.razao_social IS NULL AND est.cnpj > %s" in sql
+    assert "emp.razao_social >" not in sql
+    assert params == [0, 500000, "00000000000191", 10]
+    assert _placeholders(sql) == len(params)
+
+def test_proximo_cursor():
+    colunas = ["razao_social", "nome_fantasia", "cnpj"]
+    linhas = [("A", None, "1"), (None, "X", "2")]
+    assert proximo_cursor(linhas, colunas) == (None, "2")
+    assert proximo_cursor([], colunas) is None
+
+def test_cidade_so_deriva_uf_com_podar_por_cidade():
+    f = _filtros(cidade="7107")
+    (sql, params), _ = consultas.build_queries(f)
+    assert "SELECT m.uf" not in sql
+    (sql, params), _ = consultas.build_queries(f, podar_por_cidade=True)
+    assert "m.uf IS NOT NULL" in sql
+    assert params[:2] == ["7107", "7107"]
+    assert _placeholders(sql) == len(params)
+    (sql_dist, _), _ = consultas.build_queries_amostra(f)
+    assert "SELECT m.uf" not in sql_dist
+
+def test_estimar_total():
+    estimativa, minimo, maximo = consultas.estimar_total(100, percentual=1.0)
+    assert estimativa == 10000
+    assert minimo < estimativa < maximo
+    assert consultas.estimar_total(0, percentual=1.0) == (0, 0, 300)
+
+def test_resumir_amostra():
+    linhas = [(1, 1, None, None, 50), (0, 1, "SP", None, 30), (0, 1, "RJ", None, 20), (1, 0, None, 2, 40)]
+    total, por_uf, por_situacao = consultas.resumir_amostra(linhas, percentual=1.0)
+    assert total[0] == 5000
+    assert por_uf["SP"][0] == 3000 and por_uf["RJ"][0] == 2000
+    assert por_situacao[2][0] == 4000
+
+def test_resumir_facetas():
+    campos = ["uf", "situacao_cadastral"]
+    linhas = [(0, 1, "SP", None, 3), (0, 1, "RJ", None, 7), (1, 0, None, 2, 10)]
+    facetas = consultas.resumir_facetas(linhas, campos)
+    assert facetas["uf"] == [("RJ", 7), ("SP", 3)]
+    assert facetas["situacao_cadastral"] == [(2, 10)]
+
+def test_facetas_campo_invalido():
+    with pytest.raises(ValueError):
+        consultas.build_query_facetas(_filtros(), ["uf; DROP TABLE empresa"])
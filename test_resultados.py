@@ -0,0 +1,27 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from resultados import montar_dataframe
+
+COLUNAS = ["cnpj", "porte_empresa", "cnae_descricao", "situacao_cadastral", "capital_social"]
+
+def test_lotes_com_categoria_toda_nula():
+    lotes = [
+        (COLUNAS, [("00000000000191", None, None, 2, None)]),
+        (COLUNAS, [("00000000000272", "01", "Padaria", 8, 1500.0),
+                   ("00000000000353", "05", None, None, 10.0)]),
+        (COLUNAS, [("00000000000434", None, None, 2, 0.0)]),
+    ]
+    df = montar_dataframe(lotes)
+    assert len(df) == 4
+    assert df["cnae_descricao"].dtype == "category"
+    assert df["cnae_descricao"].isna().tolist() == [True, False, True, True]
+    assert df["cnae_descricao"].iloc[1] == "Padaria"
+    assert df["porte_empresa"].astype(object).fillna("").tolist() == ["", "01", "05", ""]
+    assert df["situacao_cadastral"].isna().tolist() == [False, False, True, False]
+
+def test_lotes_vazios():
+    df = montar_dataframe([(COLUNAS, [])])
+    assert list(df.columns) == COLUNAS
+    assert df.empty
@@ -0,0 +1,13 @@
+import pytest
+
+servico = pytest.importorskip("servico")
+
+def test_cursor_ida_e_volta():
+    for cursor in (("ACME LTDA", "00000000000191"), (None, "00000000000191"), (1, "12345678000299")):
+        assert servico.decodificar_cursor(servico.codificar_cursor(cursor)) == cursor
+    assert servico.codificar_cursor(None) is None
+    assert servico.decodificar_cursor("") is None
+
+def test_cursor_invalido():
+    with pytest.raises(servico.ErroRequisicao):
+        servico.decodificar_cursor("não é base64")